@@ -35,8 +35,10 @@ from devices import DeviceRTL, get_devices_rtl
 from events import Event, post_event, EventThread
 from file import save_plot, export_plot, ScanInfo, File
 from misc import nearest, calc_real_dwell, next_2_to_pow
+from planner import calc_window
 from scan import ThreadScan, anaylse_data, update_spectrum
 from settings import Settings
+from spectrum import SpectrumStore
 
 
 class Cli(object):
@@ -51,14 +53,17 @@ class Cli(object):
         index = args.index
         remote = args.remote
         directory, filename = os.path.split(args.file)
-        _null, ext = os.path.splitext(args.file)
+        name, ext = os.path.splitext(args.file)
+        compress = ext == File.GZIP
+        if compress:
+            _null, ext = os.path.splitext(name)
 
         self.lock = threading.Lock()
 
         self.stepsTotal = 0
         self.steps = 0
 
-        self.spectrum = {}
+        self.spectrum = SpectrumStore()
         self.settings = Settings(load=False)
 
         self.queue = Queue.Queue()
@@ -71,6 +76,9 @@ class Cli(object):
             error = "Dwell should be positive"
         elif nfft <= 0:
             error = "FFT bins should be positive"
+        elif ext == ".rfs" and compress:
+            error = "Scan files are already compressed, remove the "
+            error += File.GZIP + " extension"
         elif ext != ".rfs" and File.get_type_index(ext) == -1:
             error = "File extension should be "
             error += File.get_type_pretty(File.Types.SAVE)
@@ -164,11 +172,12 @@ class Cli(object):
         elif status == Event.STEPS:
             self.stepsTotal = (freq + 1) * 2
             self.steps = self.stepsTotal
+            print "{0} steps, {1:.1f}s per sweep".format(freq + 1, data)
         elif status == Event.INFO:
             if data != -1:
                 self.settings.devicesRtl[self.settings.indexRtl].tuner = data
         elif status == Event.DATA:
-            cal = self.settings.devicesRtl[self.settings.indexRtl].calibration
+            cal = self.settings.devicesRtl[data[2]].calibration
             pool.apply_async(anaylse_data, (freq, data, cal,
                                             self.settings.nfft,
                                             self.settings.overlap,
@@ -179,18 +188,22 @@ class Cli(object):
             print "Error: {0}".format(data)
             exit(1)
         elif status == Event.PROCESSED:
-            offset = self.settings.devicesRtl[self.settings.indexRtl].offset
+            offset = self.settings.devicesRtl[data[2]].offset
+            width = calc_window(SAMPLE_RATE, self.settings.passband, offset)
             Thread(target=update_spectrum, name='Update',
                    args=(queue, self.lock, self.settings.start,
                          self.settings.stop, freq,
-                         data, offset, self.spectrum, False,)).start()
+                         data, offset, width, self.spectrum, False,)).start()
         elif status == Event.UPDATED:
             self.__progress()
 
     def __on_process_done(self, data):
-        timeStamp, freq, scan = data
+        if data is None:
+            post_event(self.queue, EventThread(Event.UPDATED))
+            return
+        timeStamp, freq, scan, device = data
         post_event(self.queue, EventThread(Event.PROCESSED, freq,
-                                           (timeStamp, scan)))
+                                           (timeStamp, scan, device)))
 
     def __progress(self):
         self.steps -= 1
@@ -75,6 +75,16 @@ TUNER = ["Unknown",
          "Rafael Micro R820T",
          "Rafael Micro R828D"]
 
+INTERPOLATION = ['nearest',
+                 'bilinear',
+                 'bicubic',
+                 'spline16',
+                 'spline36',
+                 'hanning',
+                 'hamming',
+                 'gaussian',
+                 'lanczos']
+
 WINFUNC = ["Bartlett", numpy.bartlett,
            "Blackman", numpy.blackman,
            "Hamming", numpy.hamming,
@@ -106,6 +116,16 @@ class PlotFunc(object):
     NONE, AVG, MIN, MAX, VAR = range(5)
 
 
+class GeoInterp(object):
+    LINEAR, IDW, NEAREST = range(3)
+    NAMES = ["Linear", "Inverse distance", "Nearest"]
+
+
+class GeoStat(object):
+    PEAK, MEAN, CHANNEL = range(3)
+    NAMES = ["Peak", "Mean", "Channel power"]
+
+
 class Markers(object):
     MIN, MAX, AVG, GMEAN, \
         HP, HFS, HFE, \
@@ -70,6 +70,7 @@ class DeviceRTL(object):
         self.lo = 0
         self.offset = 250e3
         self.tuner = 0
+        self.sweep = False
 
     def set(self, device):
         self.gain = device.gain
@@ -77,6 +78,7 @@ class DeviceRTL(object):
         self.lo = device.lo
         self.offset = device.offset
         self.tuner = device.tuner
+        self.sweep = device.sweep
 
     def get_gains_str(self):
         gainsStr = []
@@ -33,7 +33,7 @@ import textwrap
 from urlparse import urlparse
 
 from PIL import Image
-from matplotlib import mlab, patheffects
+from matplotlib import patheffects
 import matplotlib
 from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib.backends.backend_wxagg import FigureCanvasWxAgg as FigureCanvas
@@ -48,18 +48,19 @@ from wx.lib.agw.cubecolourdialog import CubeColourDialog
 from wx.lib.masked.numctrl import NumCtrl
 
 from constants import F_MIN, F_MAX, Cal, SAMPLE_RATE, BANDWIDTH, WINFUNC, \
-    TUNER
+    TUNER, INTERPOLATION, GeoInterp, GeoStat
 from controls import TickCellRenderer, SatLevel
 from devices import DeviceRTL, DeviceGPS
 from events import Event
 from file import open_plot, File, export_image
+from geo import Interpolator
 from location import ThreadLocation
 from misc import format_precision, format_time, nearest, get_serial_ports, \
     get_version_timestamp, limit
 from panels import PanelGraphCompare, PanelColourBar, PanelLine
 from plot_line import Plotter
 from rtltcp import RtlTcp
-from spectrum import count_points, sort_spectrum, Extent
+from spectrum import count_points, Extent, BandLevels
 from utils_mpl import get_colours
 from utils_wx import close_modeless, ValidatorCoord, load_bitmap
 
@@ -380,10 +381,13 @@ class DialogImageSize(wx.Dialog):
 
 class DialogSeq(wx.Dialog):
     POLL = 250
+    PREVIEW_MAX = 50
 
-    def __init__(self, parent, spectrum, settings):
+    def __init__(self, parent, spectrum, settings, scanFile=None):
         self.spectrum = spectrum
         self.settings = settings
+        self.scanFile = scanFile
+        self.timeStamps = []
         self.sweeps = None
         self.isExporting = False
 
@@ -413,7 +417,10 @@ class DialogSeq(wx.Dialog):
         sizerCheck.Add(self.checkGrid, flag=wx.ALL, border=5)
         sizerCheck.Add(self.checkBar, flag=wx.ALL, border=5)
 
-        self.sweepTimeStamps = sorted([timeStamp for timeStamp in spectrum.keys()])
+        timeStamps = set(spectrum.keys())
+        if scanFile is not None:
+            timeStamps.update(scanFile.get_times().tolist())
+        self.sweepTimeStamps = sorted(timeStamps)
         sweepChoices = [format_time(timeStamp, True) for timeStamp in self.sweepTimeStamps]
 
         textStart = wx.StaticText(self, label="Start")
@@ -534,20 +541,21 @@ class DialogSeq(wx.Dialog):
 
     def __on_ok(self, _event):
         self.isExporting = True
-        extent = Extent(self.spectrum)
-        dlgProgress = wx.ProgressDialog('Exporting', '', len(self.sweeps) - 1,
+        extent = self.__get_extent()
+        dlgProgress = wx.ProgressDialog('Exporting', '', len(self.timeStamps) - 1,
                                         style=wx.PD_AUTO_HIDE |
                                         wx.PD_CAN_ABORT |
                                         wx.PD_REMAINING_TIME)
 
         try:
             count = 1
-            for timeStamp, sweep in self.sweeps.items():
+            for timeStamp in reversed(self.timeStamps):
                 name = '{0:.0f}.png'.format(timeStamp)
                 directory = self.editDir.GetValue()
                 filename = os.path.join(directory, name)
 
-                thread = self.plot.set_plot({timeStamp: sweep}, extent, False)
+                sweep = self.__read_sweeps([timeStamp])
+                thread = self.plot.set_plot(sweep, extent, False)
                 thread.join()
                 filename = os.path.join(directory, '{0}.png'.format(timeStamp))
                 export_image(filename, File.ImageType.PNG,
@@ -565,23 +573,51 @@ class DialogSeq(wx.Dialog):
             self.EndModal(wx.ID_OK)
 
     def __spectrum_range(self, start, end):
-        sweeps = {}
-        for timeStamp, sweep in self.spectrum.items():
-            if start <= timeStamp <= end:
-                sweeps[timeStamp] = sweep
+        self.timeStamps = [timeStamp for timeStamp in self.sweepTimeStamps
+                           if start <= timeStamp <= end]
+        if self.scanFile is None:
+            self.sweeps = self.spectrum.copy(True, start, end)
+            return
 
-        self.sweeps = sort_spectrum(sweeps)
+        timeStamps = self.timeStamps
+        if len(timeStamps) > self.PREVIEW_MAX:
+            indices = numpy.linspace(0, len(timeStamps) - 1, self.PREVIEW_MAX)
+            indices = numpy.unique(indices.round().astype(int))
+            timeStamps = [timeStamps[i] for i in indices]
+        self.sweeps = self.__read_sweeps(timeStamps)
+
+    def __read_sweeps(self, timeStamps):
+        if self.scanFile is None:
+            return self.spectrum.copy(True, timeStamps[0], timeStamps[-1])
+
+        stored = [timeStamp for timeStamp in timeStamps
+                  if timeStamp in self.scanFile]
+        sweeps, _location = self.scanFile.read_sweeps(stored)
+        bins = len(sweeps.get_freqs())
+        for timeStamp in timeStamps:
+            if timeStamp not in sweeps and timeStamp in self.spectrum:
+                levels = self.spectrum.get_row(timeStamp)
+                if len(levels) == bins:
+                    sweeps.set_sweep(timeStamp, levels)
+        sweeps.descending = True
+
+        return sweeps
+
+    def __get_extent(self):
+        if self.scanFile is None:
+            return Extent(self.spectrum)
+        return Extent(self.sweeps)
 
     def __draw_plot(self):
         start, end = self.__get_range()
         self.__spectrum_range(start, end)
 
-        self.textSweeps.SetLabel('Sweeps: {}'.format(len(self.sweeps)))
+        self.textSweeps.SetLabel('Sweeps: {}'.format(len(self.timeStamps)))
 
         if len(self.sweeps) > 0:
             total = count_points(self.sweeps)
             if total > 0:
-                extent = Extent(self.spectrum)
+                extent = self.__get_extent()
                 self.plot.set_plot(self.sweeps, extent, False)
         else:
             self.plot.clear_plots()
@@ -608,6 +644,9 @@ class DialogGeo(wx.Dialog):
         self.canvas = None
         self.extent = None
         self.xyz = None
+        self.bandLevels = BandLevels(spectrum, location)
+        self.interpolator = None
+        self.interpKey = None
         self.plotAxes = False
         self.plotHeat = True
         self.plotCont = True
@@ -671,6 +710,27 @@ class DialogGeo(wx.Dialog):
         self.Bind(wx.EVT_BUTTON, self.__on_imageres, buttonRes)
         self.__show_image_res()
 
+        textInterp = wx.StaticText(self, label='Interpolation')
+        self.choiceInterp = wx.Choice(self, choices=GeoInterp.NAMES)
+        self.choiceInterp.SetSelection(settings.geoInterp)
+        self.choiceInterp.SetToolTip(wx.ToolTip('Interpolation method'))
+        self.Bind(wx.EVT_CHOICE, self.__on_interp, self.choiceInterp)
+
+        textGrid = wx.StaticText(self, label='Grid size')
+        self.spinGrid = wx.SpinCtrl(self)
+        self.spinGrid.SetToolTip(wx.ToolTip('Interpolation grid points per'
+                                            ' axis'))
+        self.spinGrid.SetRange(50, 2000)
+        self.spinGrid.SetValue(settings.geoResolution)
+        self.Bind(wx.EVT_SPINCTRL, self.__on_update, self.spinGrid)
+
+        textStat = wx.StaticText(self, label='Level')
+        self.choiceStat = wx.Choice(self, choices=GeoStat.NAMES)
+        self.choiceStat.SetSelection(settings.geoStat)
+        self.choiceStat.SetToolTip(wx.ToolTip('Level plotted at each'
+                                              ' location'))
+        self.Bind(wx.EVT_CHOICE, self.__on_stat, self.choiceStat)
+
         sizerButtons = wx.StdDialogButtonSizer()
         buttonOk = wx.Button(self, wx.ID_OK)
         buttonCancel = wx.Button(self, wx.ID_CANCEL)
@@ -706,7 +766,19 @@ class DialogGeo(wx.Dialog):
                       flag=wx.ALL, border=5)
         sizerGrid.Add(buttonRes, pos=(5, 2), span=(1, 1),
                       flag=wx.ALL, border=5)
-        sizerGrid.Add(sizerButtons, pos=(6, 2), span=(1, 1),
+        sizerGrid.Add(textInterp, pos=(6, 0), span=(1, 1),
+                      flag=wx.ALL, border=5)
+        sizerGrid.Add(self.choiceInterp, pos=(6, 1), span=(1, 1),
+                      flag=wx.ALL, border=5)
+        sizerGrid.Add(textGrid, pos=(7, 0), span=(1, 1),
+                      flag=wx.ALL, border=5)
+        sizerGrid.Add(self.spinGrid, pos=(7, 1), span=(1, 1),
+                      flag=wx.ALL, border=5)
+        sizerGrid.Add(textStat, pos=(8, 0), span=(1, 1),
+                      flag=wx.ALL, border=5)
+        sizerGrid.Add(self.choiceStat, pos=(8, 1), span=(1, 1),
+                      flag=wx.ALL, border=5)
+        sizerGrid.Add(sizerButtons, pos=(9, 2), span=(1, 1),
                       flag=wx.ALIGN_RIGHT | wx.ALL, border=5)
 
         self.SetSizerAndFit(sizerGrid)
@@ -732,45 +804,41 @@ class DialogGeo(wx.Dialog):
         self.axes.xaxis.set_major_formatter(formatter)
         self.axes.yaxis.set_major_formatter(formatter)
 
+    def __create_interpolator(self, freqMin, freqMax, stat):
+        coords, levels = self.bandLevels.get_stat(freqMin, freqMax, stat)
+        x = coords[:, 1]
+        y = coords[:, 0]
+
+        self.xyz = (x.tolist(), y.tolist(), levels.tolist())
+        self.interpolator = Interpolator(x, y, levels)
+        self.interpKey = (freqMin, freqMax, stat)
+
     def __draw_plot(self):
         self.plot = None
-        x = []
-        y = []
-        z = []
 
         freqCentre = self.spinCentre.GetValue()
         freqBw = self.spinBw.GetValue()
         freqMin = (freqCentre - freqBw) / 1000.
         freqMax = (freqCentre + freqBw) / 1000.
 
-        for timeStamp in self.spectrum:
-            spectrum = self.spectrum[timeStamp]
-            sweep = [yv for xv, yv in spectrum.items() if freqMin <= xv <= freqMax]
-            if len(sweep):
-                peak = max(sweep)
-                try:
-                    location = self.location[timeStamp]
-                except KeyError:
-                    continue
-                x.append(location[1])
-                y.append(location[0])
-                z.append(peak)
-
-        if len(x) == 0:
+        stat = self.settings.geoStat
+        if self.interpKey != (freqMin, freqMax, stat):
+            self.__create_interpolator(freqMin, freqMax, stat)
+
+        if len(self.interpolator) == 0:
             self.__draw_warning()
             return
 
-        xi = numpy.linspace(min(x), max(x), 500)
-        yi = numpy.linspace(min(y), max(y), 500)
-
+        self.settings.geoResolution = self.spinGrid.GetValue()
         try:
-            zi = mlab.griddata(x, y, z, xi, yi)
-        except:
+            xi, yi, zi = self.interpolator.get_grid(self.settings.geoInterp,
+                                                    self.settings.geoResolution)
+        except (RuntimeError, ValueError):
             self.__draw_warning()
             return
 
-        self.extent = (min(x), max(x), min(y), max(y))
-        self.xyz = (x, y, z)
+        self.extent = self.interpolator.get_extent()
+        x, y, z = self.xyz
 
         if self.plotHeat:
             self.plot = self.axes.pcolormesh(xi, yi, zi, cmap=self.colourMap)
@@ -837,6 +905,14 @@ class DialogGeo(wx.Dialog):
         self.plotPoint = self.checkPoint.GetValue()
         self.__on_update(None)
 
+    def __on_interp(self, _event):
+        self.settings.geoInterp = self.choiceInterp.GetSelection()
+        self.__on_update(None)
+
+    def __on_stat(self, _event):
+        self.settings.geoStat = self.choiceStat.GetSelection()
+        self.__on_update(None)
+
     def __on_colour(self, _event):
         self.colourMap = self.choiceColour.GetStringSelection()
         self.colourBar.set_map(self.colourMap)
@@ -1293,6 +1369,10 @@ class DialogPrefs(wx.Dialog):
         self.spinCtrlMaxScans.SetValue(settings.retainMax)
         self.spinCtrlMaxScans.SetToolTip(wx.ToolTip('Maximum previous scans'
                                                     ' to display'))
+        self.checkRecord = wx.CheckBox(self, wx.ID_ANY, "Record scans")
+        self.checkRecord.SetValue(settings.recordScans)
+        self.checkRecord.SetToolTip(wx.ToolTip('Append each sweep to a file'
+                                               ' in the scans directory'))
 
         self.checkFade = wx.CheckBox(self, wx.ID_ANY,
                                      "Fade previous scans")
@@ -1301,6 +1381,33 @@ class DialogPrefs(wx.Dialog):
         self.ctrlWidth = NumCtrl(self, integerWidth=2, fractionWidth=1)
         self.ctrlWidth.SetValue(settings.lineWidth)
 
+        textInterp = wx.StaticText(self, label="Interpolation")
+        self.choiceInterp = wx.Choice(self, choices=INTERPOLATION)
+        if settings.interpolation in INTERPOLATION:
+            self.choiceInterp.SetSelection(INTERPOLATION.index(settings.interpolation))
+        else:
+            self.choiceInterp.SetSelection(INTERPOLATION.index('spline16'))
+        self.choiceInterp.SetToolTip(wx.ToolTip('Image interpolation'))
+        textPolys = wx.StaticText(self, label="3D polygons")
+        self.spinPolys = wx.SpinCtrl(self, wx.ID_ANY, min=1000, max=1000000)
+        self.spinPolys.SetValue(settings.polysMax)
+        self.spinPolys.SetToolTip(wx.ToolTip('Maximum number of polygons in'
+                                             ' 3D spectrograms'))
+
+        textBandwidth = wx.StaticText(self, label="Bandwidth level (dB)")
+        self.ctrlBandwidth = NumCtrl(self, integerWidth=2, fractionWidth=1,
+                                     min=0.1, max=60, limited=True)
+        self.ctrlBandwidth.SetValue(settings.bandwidthDb)
+        self.ctrlBandwidth.SetToolTip(wx.ToolTip('Level below the peak used'
+                                                 ' for the x-dB bandwidth'))
+        textObw = wx.StaticText(self, label="Occupied bandwidth (%)")
+        self.ctrlObw = NumCtrl(self, integerWidth=2, fractionWidth=1,
+                               min=1, max=99.9, limited=True)
+        self.ctrlObw.SetValue(settings.obwPercent)
+        self.ctrlObw.SetToolTip(wx.ToolTip('Percentage of the total power'
+                                           ' contained in the occupied'
+                                           ' bandwidth'))
+
         self.__on_radio(None)
 
         sizerButtons = wx.StdDialogButtonSizer()
@@ -1335,6 +1442,7 @@ class DialogPrefs(wx.Dialog):
         congrid.Add(textMaxScans, pos=(2, 0),
                     flag=wx.ALIGN_CENTRE_VERTICAL)
         congrid.Add(self.spinCtrlMaxScans, pos=(2, 1))
+        congrid.Add(self.checkRecord, pos=(3, 0))
         conbox = wx.StaticBoxSizer(wx.StaticBox(self, wx.ID_ANY,
                                                 "Continuous Scans"),
                                    wx.VERTICAL)
@@ -1348,11 +1456,33 @@ class DialogPrefs(wx.Dialog):
                                     wx.HORIZONTAL)
         plotbox.Add(plotgrid, 0, wx.ALL | wx.EXPAND, 10)
 
+        spectgrid = wx.GridBagSizer(10, 10)
+        spectgrid.Add(textInterp, pos=(0, 0))
+        spectgrid.Add(self.choiceInterp, pos=(0, 1))
+        spectgrid.Add(textPolys, pos=(1, 0))
+        spectgrid.Add(self.spinPolys, pos=(1, 1))
+        spectbox = wx.StaticBoxSizer(wx.StaticBox(self, wx.ID_ANY,
+                                                  "Spectrogram View"),
+                                     wx.HORIZONTAL)
+        spectbox.Add(spectgrid, 0, wx.ALL | wx.EXPAND, 10)
+
         grid = wx.GridBagSizer(10, 10)
         grid.Add(genbox, pos=(0, 0), span=(1, 2), flag=wx.EXPAND)
         grid.Add(conbox, pos=(1, 0), span=(1, 2), flag=wx.EXPAND)
         grid.Add(plotbox, pos=(2, 0), span=(1, 2), flag=wx.EXPAND)
-        grid.Add(sizerButtons, pos=(3, 1), flag=wx.EXPAND)
+        measgrid = wx.GridBagSizer(10, 10)
+        measgrid.Add(textBandwidth, pos=(0, 0))
+        measgrid.Add(self.ctrlBandwidth, pos=(0, 1))
+        measgrid.Add(textObw, pos=(1, 0))
+        measgrid.Add(self.ctrlObw, pos=(1, 1))
+        measbox = wx.StaticBoxSizer(wx.StaticBox(self, wx.ID_ANY,
+                                                 "Measurements"),
+                                    wx.HORIZONTAL)
+        measbox.Add(measgrid, 0, wx.ALL | wx.EXPAND, 10)
+
+        grid.Add(spectbox, pos=(3, 0), span=(1, 2), flag=wx.EXPAND)
+        grid.Add(measbox, pos=(4, 0), span=(1, 2), flag=wx.EXPAND)
+        grid.Add(sizerButtons, pos=(5, 1), flag=wx.EXPAND)
 
         box = wx.BoxSizer()
         box.Add(grid, flag=wx.ALL | wx.ALIGN_CENTRE, border=10)
@@ -1399,8 +1529,13 @@ class DialogPrefs(wx.Dialog):
         self.settings.fadeScans = self.checkFade.GetValue()
         self.settings.lineWidth = self.ctrlWidth.GetValue()
         self.settings.retainMax = self.spinCtrlMaxScans.GetValue()
+        self.settings.recordScans = self.checkRecord.GetValue()
         self.settings.colourMap = self.choiceColour.GetStringSelection()
         self.settings.background = self.background
+        self.settings.interpolation = self.choiceInterp.GetStringSelection()
+        self.settings.polysMax = self.spinPolys.GetValue()
+        self.settings.bandwidthDb = self.ctrlBandwidth.GetValue()
+        self.settings.obwPercent = self.ctrlObw.GetValue()
 
         self.EndModal(wx.ID_OK)
 
@@ -1423,6 +1558,24 @@ class DialogAdvPrefs(wx.Dialog):
         textWindow = wx.StaticText(self, label='Window')
         self.buttonWindow = wx.Button(self, wx.ID_ANY, self.winFunc)
         self.Bind(wx.EVT_BUTTON, self.__on_window, self.buttonWindow)
+        textPassband = wx.StaticText(self, label='Passband (%)')
+        self.slidePassband = wx.Slider(self, wx.ID_ANY,
+                                       settings.passband * 100,
+                                       25, 100,
+                                       style=wx.SL_LABELS)
+        self.slidePassband.SetToolTip(wx.ToolTip('Usable flat part of the'
+                                                 ' sampled bandwidth'))
+        self.checkPipeline = wx.CheckBox(self, wx.ID_ANY,
+                                         "Pipelined capture")
+        self.checkPipeline.SetValue(settings.pipeline)
+        self.checkPipeline.SetToolTip(wx.ToolTip('Overlap tuning and capture'
+                                                 ' with processing'))
+        textSettle = wx.StaticText(self, label='Settle samples')
+        self.spinSettle = wx.SpinCtrl(self, wx.ID_ANY, min=0,
+                                      max=int(SAMPLE_RATE))
+        self.spinSettle.SetValue(settings.settle)
+        self.spinSettle.SetToolTip(wx.ToolTip('Samples discarded after'
+                                              ' retuning (rtl_tcp)'))
 
         buttonOk = wx.Button(self, wx.ID_OK)
         buttonCancel = wx.Button(self, wx.ID_CANCEL)
@@ -1438,7 +1591,13 @@ class DialogAdvPrefs(wx.Dialog):
         advgrid.Add(self.slideOverlap, pos=(0, 1), flag=wx.EXPAND)
         advgrid.Add(textWindow, pos=(1, 0), flag=wx.EXPAND)
         advgrid.Add(self.buttonWindow, pos=(1, 1))
-        advgrid.Add(sizerButtons, pos=(2, 1), flag=wx.EXPAND)
+        advgrid.Add(textPassband, pos=(2, 0),
+                    flag=wx.ALL | wx.ALIGN_CENTRE)
+        advgrid.Add(self.slidePassband, pos=(2, 1), flag=wx.EXPAND)
+        advgrid.Add(self.checkPipeline, pos=(3, 0), span=(1, 2))
+        advgrid.Add(textSettle, pos=(4, 0), flag=wx.EXPAND)
+        advgrid.Add(self.spinSettle, pos=(4, 1))
+        advgrid.Add(sizerButtons, pos=(5, 1), flag=wx.EXPAND)
 
         advBox = wx.BoxSizer()
         advBox.Add(advgrid, flag=wx.ALL | wx.ALIGN_CENTRE, border=10)
@@ -1455,6 +1614,9 @@ class DialogAdvPrefs(wx.Dialog):
     def __on_ok(self, _event):
         self.settings.overlap = self.slideOverlap.GetValue() / 100.0
         self.settings.winFunc = self.winFunc
+        self.settings.passband = self.slidePassband.GetValue() / 100.0
+        self.settings.pipeline = self.checkPipeline.GetValue()
+        self.settings.settle = self.spinSettle.GetValue()
 
         self.EndModal(wx.ID_OK)
 
@@ -1583,7 +1745,7 @@ class DialogWinFunc(wx.Dialog):
 
 class DialogDevicesRTL(wx.Dialog):
     COL_SEL, COL_DEV, COL_TUN, COL_SER, COL_IND, \
-        COL_GAIN, COL_CAL, COL_LO, COL_OFF = range(9)
+        COL_GAIN, COL_CAL, COL_LO, COL_OFF, COL_SWEEP = range(10)
 
     def __init__(self, parent, devices, settings):
         self.devices = copy.copy(devices)
@@ -1593,7 +1755,7 @@ class DialogDevicesRTL(wx.Dialog):
         wx.Dialog.__init__(self, parent=parent, title="Radio Devices")
 
         self.gridDev = grid.Grid(self)
-        self.gridDev.CreateGrid(len(self.devices), 9)
+        self.gridDev.CreateGrid(len(self.devices), 10)
         self.gridDev.SetRowLabelSize(0)
         self.gridDev.SetColLabelValue(self.COL_SEL, "Selected")
         self.gridDev.SetColLabelValue(self.COL_DEV, "Device")
@@ -1604,6 +1766,7 @@ class DialogDevicesRTL(wx.Dialog):
         self.gridDev.SetColLabelValue(self.COL_CAL, "Calibration\n(ppm)")
         self.gridDev.SetColLabelValue(self.COL_LO, "LO\n(MHz)")
         self.gridDev.SetColLabelValue(self.COL_OFF, "Band Offset\n(kHz)")
+        self.gridDev.SetColLabelValue(self.COL_SWEEP, "Sweep")
         self.gridDev.SetColFormatFloat(self.COL_GAIN, -1, 1)
         self.gridDev.SetColFormatFloat(self.COL_CAL, -1, 3)
         self.gridDev.SetColFormatFloat(self.COL_LO, -1, 3)
@@ -1651,8 +1814,11 @@ class DialogDevicesRTL(wx.Dialog):
             self.gridDev.SetReadOnly(i, self.COL_TUN, True)
             self.gridDev.SetReadOnly(i, self.COL_SER, True)
             self.gridDev.SetReadOnly(i, self.COL_IND, True)
+            self.gridDev.SetReadOnly(i, self.COL_SWEEP, True)
             self.gridDev.SetCellRenderer(i, self.COL_SEL,
                                          TickCellRenderer())
+            self.gridDev.SetCellRenderer(i, self.COL_SWEEP,
+                                         TickCellRenderer())
             if device.isDevice:
                 cell = grid.GridCellChoiceEditor(map(str, device.gains),
                                                  allowOthers=False)
@@ -1684,6 +1850,8 @@ class DialogDevicesRTL(wx.Dialog):
             self.gridDev.SetCellValue(i, self.COL_CAL, str(device.calibration))
             self.gridDev.SetCellValue(i, self.COL_LO, str(device.lo))
             self.gridDev.SetCellValue(i, self.COL_OFF, str(device.offset / 1e3))
+            self.gridDev.SetCellValue(i, self.COL_SWEEP,
+                                      str(int(device.sweep)))
             i += 1
 
         if self.settings.indexRtl >= len(self.devices):
@@ -1712,6 +1880,7 @@ class DialogDevicesRTL(wx.Dialog):
             device.calibration = float(self.gridDev.GetCellValue(i, self.COL_CAL))
             device.lo = float(self.gridDev.GetCellValue(i, self.COL_LO))
             device.offset = float(self.gridDev.GetCellValue(i, self.COL_OFF)) * 1e3
+            device.sweep = self.gridDev.GetCellValue(i, self.COL_SWEEP) == "1"
             i += 1
 
     def __set_button_state(self):
@@ -1755,6 +1924,12 @@ class DialogDevicesRTL(wx.Dialog):
                 self.gridDev.SetCellValue(index, self.COL_OFF,
                                           str(dlg.get_offset()))
             dlg.Destroy()
+        elif col == self.COL_SWEEP:
+            if self.gridDev.GetCellValue(index, self.COL_SWEEP) == "1":
+                tick = "0"
+            else:
+                tick = "1"
+            self.gridDev.SetCellValue(index, self.COL_SWEEP, tick)
         else:
             self.gridDev.ForceRefresh()
             event.Skip()
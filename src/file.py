@@ -23,23 +23,32 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+import Queue
 import cPickle
 import datetime
+import gzip
+import io
 import json
 import os
+import struct
 import subprocess
 import sys
 import tempfile
+import threading
+import time
 import uuid
 import zipfile
+import zlib
 
 from PIL import Image
 import matplotlib
 from matplotlib.backends.backend_agg import FigureCanvasAgg
+import numpy
 import wx
 
 from misc import format_iso_time
-from spectrum import sort_spectrum, create_mesh
+from spectrum import SpectrumStore, iter_sweeps, split_spectrum_array, \
+    create_array_sorted, create_mesh_arrays
 
 
 class File(object):
@@ -50,7 +59,7 @@ class File(object):
         RFS = 0
 
     class PlotType(object):
-        CSV, GNUPLOT, FREEMAT, WWB = range(4)
+        CSV, GNUPLOT, FREEMAT, WWB, MAT, NPZ = range(6)
 
     class ImageType(object):
         BMP, EPS, GIF, JPEG, PDF, PNG, PPM, TIFF = range(8)
@@ -64,11 +73,13 @@ class File(object):
     SAVE = [''] * 1
     SAVE[SaveType.RFS] = 'RTLSDR frequency scan (*.rfs)|*.rfs'
 
-    PLOT = [''] * 4
+    PLOT = [''] * 6
     PLOT[PlotType.CSV] = "CSV table (*.csv)|*.csv"
     PLOT[PlotType.GNUPLOT] = "gnuplot script (*.plt)|*.plt"
     PLOT[PlotType.FREEMAT] = "FreeMat script (*.m)|*.m"
     PLOT[PlotType.WWB] = "Wireless Workbench (*.sdb2)|*.sdb2"
+    PLOT[PlotType.MAT] = "MATLAB/Octave data (*.mat)|*.mat"
+    PLOT[PlotType.NPZ] = "NumPy arrays (*.npz)|*.npz"
 
     IMAGE = [''] * 8
     IMAGE[ImageType.BMP] = 'Bitmap image (*.bmp)|*.bmp'
@@ -95,8 +106,10 @@ class File(object):
     TRACK = [''] * 1
     TRACK[TrackType.GPX] = 'GPX track (*.gpx)|*.gpx'
 
+    GZIP = '.gz'
+
     HEADER = "RTLSDR Scanner"
-    VERSION = 9
+    VERSION = 10
 
     @staticmethod
     def __get_types(type):
@@ -185,6 +198,307 @@ class ScanInfo(object):
         settings.dwell = self.dwell
         settings.nfft = self.nfft
 
+    def to_header(self):
+        return {'Version': File.VERSION,
+                'Start': self.start,
+                'Stop': self.stop,
+                'Dwell': self.dwell,
+                'Nfft': self.nfft,
+                'Device': self.name,
+                'Gain': self.gain,
+                'LO': self.lo,
+                'Calibration': self.calibration,
+                'Tuner': self.tuner,
+                'Time': self.time,
+                'Latitude': self.lat,
+                'Longitude': self.lon,
+                'Description': self.desc}
+
+    def set_from_header(self, header):
+        self.start = header['Start']
+        self.stop = header['Stop']
+        self.dwell = header['Dwell']
+        self.nfft = header['Nfft']
+        self.name = header['Device']
+        self.gain = header['Gain']
+        self.lo = header['LO']
+        self.calibration = header['Calibration']
+        self.tuner = header['Tuner']
+        self.time = header['Time']
+        self.lat = header['Latitude']
+        self.lon = header['Longitude']
+        self.desc = header['Description']
+
+
+class ScanFile(object):
+    SWEEP = struct.Struct('<dIIddd')
+    FOOTER = struct.Struct('<4sQQ')
+    MAGIC = 'RFSI'
+    INDEX = numpy.dtype([('time', '<f8'), ('offset', '<u8'),
+                         ('lat', '<f8'), ('lon', '<f8'), ('alt', '<f8')])
+
+    def __init__(self, path):
+        self.path = path
+        self.handle = open(path, 'rb')
+        self.recovered = False
+        try:
+            header, info = json.loads(self.handle.readline())
+            if header != File.HEADER or info['Version'] < 10:
+                raise ValueError('Not a binary scan file')
+            self.info = info
+            axis = info['Axis']
+            self.start = axis['Start']
+            self.step = axis['Step']
+            self.bins = axis['Bins']
+            offset = self.handle.tell()
+            try:
+                self.index = self.__read_index()
+            except (ValueError, struct.error, zlib.error):
+                self.index = self.__scan_sweeps(offset)
+                self.recovered = True
+        except:
+            self.handle.close()
+            raise
+        self.rows = dict((timeStamp, row) for row, timeStamp
+                         in enumerate(self.index['time'].tolist()))
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, timeStamp):
+        return timeStamp in self.rows
+
+    def __read_index(self):
+        self.handle.seek(0, os.SEEK_END)
+        end = self.handle.tell() - self.FOOTER.size
+        self.handle.seek(end)
+        magic, offset, count = self.FOOTER.unpack(self.handle.read(self.FOOTER.size))
+        if magic != self.MAGIC or offset > end:
+            raise ValueError('Missing sweep index')
+        self.handle.seek(offset)
+        index = numpy.frombuffer(zlib.decompress(self.handle.read(end - offset)),
+                                 self.INDEX)
+        if len(index) != count:
+            raise ValueError('Corrupt sweep index')
+        self.end = offset
+
+        return index
+
+    def __scan_sweeps(self, offset):
+        index = []
+        self.handle.seek(offset)
+        while True:
+            header = self.handle.read(self.SWEEP.size)
+            if len(header) < self.SWEEP.size:
+                break
+            timeStamp, size, crc, lat, lon, alt = self.SWEEP.unpack(header)
+            data = self.handle.read(size)
+            if len(data) < size or zlib.crc32(data) & 0xffffffff != crc:
+                break
+            index.append((timeStamp, offset, lat, lon, alt))
+            offset += self.SWEEP.size + size
+        self.end = offset
+
+        return numpy.array(index, self.INDEX)
+
+    def get_times(self):
+        return self.index['time']
+
+    def get_freqs(self):
+        return self.start + numpy.arange(self.bins) * self.step
+
+    def get_location(self, timeStamp):
+        entry = self.index[self.rows[timeStamp]]
+        if numpy.isnan(entry['lat']):
+            return None
+        return [None if numpy.isnan(entry[key]) else float(entry[key])
+                for key in ['lat', 'lon', 'alt']]
+
+    def get_locations(self):
+        location = {}
+        for timeStamp in self.get_times().tolist():
+            loc = self.get_location(timeStamp)
+            if loc is not None:
+                location[timeStamp] = loc
+
+        return location
+
+    def get_scan_info(self):
+        scanInfo = ScanInfo()
+        scanInfo.set_from_header(self.info)
+
+        return scanInfo
+
+    def read_sweep(self, timeStamp):
+        self.handle.seek(self.index[self.rows[timeStamp]]['offset'])
+        _timeStamp, size, crc, _lat, _lon, _alt = \
+            self.SWEEP.unpack(self.handle.read(self.SWEEP.size))
+        data = self.handle.read(size)
+        if len(data) != size or zlib.crc32(data) & 0xffffffff != crc:
+            raise ValueError('Corrupt sweep')
+
+        return numpy.frombuffer(zlib.decompress(data), '<f4')
+
+    def read_spectrum(self, start=None, end=None):
+        times = self.get_times()
+        mask = numpy.ones(len(times), numpy.bool_)
+        if start is not None:
+            mask &= times >= start
+        if end is not None:
+            mask &= times <= end
+
+        return self.read_sweeps(times[mask].tolist())
+
+    def read_sweeps(self, timeStamps):
+        spectrum = SpectrumStore(len(timeStamps))
+        location = {}
+        if self.bins:
+            spectrum.set_axis(self.start, self.start + self.bins * self.step,
+                              self.step)
+        for timeStamp in sorted(timeStamps):
+            spectrum.set_sweep(timeStamp, self.read_sweep(timeStamp))
+            loc = self.get_location(timeStamp)
+            if loc is not None:
+                location[timeStamp] = loc
+                spectrum.set_location(timeStamp, loc)
+
+        return spectrum, location
+
+    def close(self):
+        self.handle.close()
+
+
+class ScanWriter(object):
+    def __init__(self, handle, scanInfo, freqs, step, index=None):
+        self.handle = handle
+        if index is not None:
+            self.index = [tuple(entry) for entry in index.tolist()]
+            return
+        self.index = []
+
+        info = scanInfo.to_header()
+        if len(freqs):
+            start = float(freqs[0])
+        else:
+            start = 0.
+        info['Axis'] = {'Start': start,
+                        'Step': step,
+                        'Bins': len(freqs)}
+        info['Compression'] = 'zlib'
+        self.handle.write(json.dumps([File.HEADER, info]))
+        self.handle.write('\n')
+
+    def write_sweep(self, timeStamp, levels, location=None):
+        if location is None:
+            location = []
+        location = [numpy.nan if value is None else value
+                    for value in list(location[:3])]
+        location += [numpy.nan] * (3 - len(location))
+
+        data = zlib.compress(numpy.asarray(levels, '<f4').tostring())
+        offset = self.handle.tell()
+        self.handle.write(ScanFile.SWEEP.pack(timeStamp, len(data),
+                                              zlib.crc32(data) & 0xffffffff,
+                                              *location))
+        self.handle.write(data)
+        self.index.append((timeStamp, offset) + tuple(location))
+
+    def close(self):
+        offset = self.handle.tell()
+        index = numpy.array(self.index, ScanFile.INDEX)
+        self.handle.write(zlib.compress(index.tostring()))
+        self.handle.write(ScanFile.FOOTER.pack(ScanFile.MAGIC, offset,
+                                               len(index)))
+
+
+class ScanRecorder(threading.Thread):
+    SYNC_INTERVAL = 10
+
+    def __init__(self, filename, scanInfo):
+        threading.Thread.__init__(self)
+        self.name = 'Recorder'
+        self.filename = filename
+        self.scanInfo = scanInfo
+        self.queue = Queue.Queue()
+        self.handle = None
+        self.writer = None
+        self.bins = None
+        self.lastSync = 0
+        self.error = None
+        self.start()
+
+    def run(self):
+        while True:
+            sweep = self.queue.get()
+            if sweep is None:
+                break
+            if self.error is None:
+                try:
+                    self.__write(*sweep)
+                except IOError as error:
+                    self.error = error
+
+        try:
+            self.__close()
+        except IOError as error:
+            self.error = error
+
+    def __open(self, freqs, step):
+        if os.path.exists(self.filename):
+            try:
+                scanFile = ScanFile(self.filename)
+                scanFile.close()
+            except (ValueError, KeyError, TypeError, struct.error, zlib.error):
+                scanFile = None
+            if scanFile is not None and scanFile.bins == len(freqs) and \
+               abs(scanFile.start - freqs[0]) < step * 1e-3 and \
+               abs(scanFile.step - step) < step * 1e-3:
+                self.handle = open(self.filename, 'r+b')
+                self.handle.seek(scanFile.end)
+                self.handle.truncate()
+                self.writer = ScanWriter(self.handle, self.scanInfo, freqs,
+                                         step, scanFile.index)
+                return
+            name, ext = os.path.splitext(self.filename)
+            self.filename = name + time.strftime(' %H%M%S') + ext
+
+        self.handle = open(self.filename, 'wb')
+        self.writer = ScanWriter(self.handle, self.scanInfo, freqs, step)
+
+    def __write(self, timeStamp, levels, location, freqs, step):
+        if self.writer is None:
+            self.__open(freqs, step)
+            self.bins = len(freqs)
+        elif len(levels) != self.bins:
+            return
+
+        self.writer.write_sweep(timeStamp, levels, location)
+        now = time.time()
+        if now - self.lastSync >= self.SYNC_INTERVAL:
+            self.__sync()
+            self.lastSync = now
+
+    def __sync(self):
+        if self.handle is not None:
+            self.handle.flush()
+            os.fsync(self.handle.fileno())
+
+    def __close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.__sync()
+            self.handle.close()
+            self.writer = None
+            self.handle = None
+
+    def record(self, spectrum, timeStamp, location=None):
+        self.queue.put((timeStamp, spectrum.get_row(timeStamp).copy(),
+                        location, spectrum.get_freqs(), spectrum.get_step()))
+
+    def close(self):
+        self.queue.put(None)
+        self.join()
+
 
 def run_file(runFile):
     if os.name == 'nt':
@@ -197,6 +511,49 @@ def run_file(runFile):
         return True
 
 
+def open_scan(path):
+    try:
+        return ScanFile(path)
+    except (ValueError, KeyError, TypeError, struct.error, zlib.error):
+        return None
+
+
+def read_scan(scanFile, limit=None):
+    start = None
+    times = numpy.sort(scanFile.get_times())
+    if limit is not None and len(times) > limit:
+        start = times[-limit]
+    try:
+        scanInfo = scanFile.get_scan_info()
+        store, _location = scanFile.read_spectrum(start)
+    except (ValueError, KeyError, struct.error, zlib.error):
+        wx.MessageBox('Invalid or corrupted file', 'Warning',
+                      wx.OK | wx.ICON_WARNING)
+        return None, None, None
+    if scanFile.recovered:
+        message = 'Incomplete file, recovered {0} sweeps'.format(len(times))
+        wx.MessageBox(message, 'Warning', wx.OK | wx.ICON_WARNING)
+
+    return scanInfo, store, scanFile.get_locations()
+
+
+def read_scan_all(scanFile, spectrum, location):
+    try:
+        store, _location = scanFile.read_spectrum()
+    except (ValueError, struct.error, zlib.error):
+        return None
+
+    bins = len(store.get_freqs())
+    for timeStamp in spectrum.keys():
+        levels = spectrum.get_row(timeStamp)
+        if timeStamp not in store and len(levels) == bins:
+            store.set_sweep(timeStamp, levels)
+            if timeStamp in location:
+                store.set_location(timeStamp, location[timeStamp])
+
+    return store
+
+
 def open_plot(dirname, filename):
     pickle = True
     error = False
@@ -217,6 +574,14 @@ def open_plot(dirname, filename):
     path = os.path.join(dirname, filename)
     if not os.path.exists(path):
         return None, None, None
+
+    scanFile = open_scan(path)
+    if scanFile is not None:
+        try:
+            return read_scan(scanFile)
+        finally:
+            scanFile.close()
+
     handle = open(path, 'rb')
     try:
         header = cPickle.load(handle)
@@ -299,35 +664,55 @@ def open_plot(dirname, filename):
     scanInfo.lon = lon
     scanInfo.desc = desc
 
-    return scanInfo, spectrum, location
-
-
-def save_plot(filename, scanInfo, spectrum, location):
-    data = [File.HEADER, {'Version': File.VERSION,
-                          'Start': scanInfo.start,
-                          'Stop': scanInfo.stop,
-                          'Dwell': scanInfo.dwell,
-                          'Nfft': scanInfo.nfft,
-                          'Device': scanInfo.name,
-                          'Gain': scanInfo.gain,
-                          'LO': scanInfo.lo,
-                          'Calibration': scanInfo.calibration,
-                          'Tuner': scanInfo.tuner,
-                          'Time': scanInfo.time,
-                          'Latitude': scanInfo.lat,
-                          'Longitude': scanInfo.lon,
-                          'Description': scanInfo.desc,
-                          'Spectrum': spectrum,
-                          'Location': location}]
-
-    handle = open(os.path.join(filename), 'wb')
-    handle.write(json.dumps(data, indent=4))
+    store = SpectrumStore()
+    store.update(spectrum)
+    for timeStamp, loc in location.iteritems():
+        if timeStamp in store:
+            store.set_location(timeStamp, loc)
+
+    return scanInfo, store, location
+
+
+def save_plot(filename, scanInfo, spectrum, location, source=None):
+    if not isinstance(spectrum, SpectrumStore):
+        store = SpectrumStore()
+        store.update(spectrum)
+        spectrum = store
+
+    replace = (source is not None and os.path.exists(filename) and
+               os.path.realpath(filename) == os.path.realpath(source.path))
+    if replace:
+        path = filename + '.tmp'
+    else:
+        path = filename
+
+    handle = open(path, 'wb')
+    writer = ScanWriter(handle, scanInfo, spectrum.get_freqs(),
+                        spectrum.get_step())
+    if source is not None:
+        for timeStamp in sorted(source.get_times().tolist()):
+            if timeStamp not in spectrum:
+                writer.write_sweep(timeStamp, source.read_sweep(timeStamp),
+                                   source.get_location(timeStamp))
+    for timeStamp in spectrum.get_times().tolist():
+        writer.write_sweep(timeStamp, spectrum.get_row(timeStamp),
+                           location.get(timeStamp))
+    writer.close()
     handle.close()
 
+    if replace:
+        source.close()
+        os.remove(filename)
+        os.rename(path, filename)
 
-def export_plot(filename, exportType, spectrum):
-    spectrum = sort_spectrum(spectrum)
-    handle = open(filename, 'wb')
+
+def export_plot(filename, exportType, spectrum, compress=None):
+    if compress is None:
+        compress = filename.endswith(File.GZIP)
+    if compress:
+        handle = gzip.open(filename, 'wb', 6)
+    else:
+        handle = open(filename, 'wb')
     if exportType == File.PlotType.CSV:
         export_csv(handle, spectrum)
     elif exportType == File.PlotType.GNUPLOT:
@@ -336,6 +721,10 @@ def export_plot(filename, exportType, spectrum):
         export_freemat(handle, spectrum)
     elif exportType == File.PlotType.WWB:
         export_wwb(handle, spectrum)
+    elif exportType == File.PlotType.MAT:
+        export_mat(handle, spectrum)
+    elif exportType == File.PlotType.NPZ:
+        export_npz(handle, spectrum)
     handle.close()
 
 
@@ -374,9 +763,10 @@ def export_map(filename, exportType, bounds, image, xyz):
 
 def export_csv(handle, spectrum):
     handle.write(u"Time (UTC), Frequency (MHz),Level (dB/Hz)\n")
-    for plot in spectrum.iteritems():
-        for freq, pwr in plot[1].iteritems():
-            handle.write("{0}, {1}, {2}\n".format(plot[0], freq, pwr))
+    for timeStamp, freqs, levels in iter_sweeps(spectrum):
+        times = numpy.empty(len(freqs))
+        times.fill(timeStamp)
+        write_rows(handle, '%.12g, %.12g, %.7g\n', times, freqs, levels)
 
 
 def export_plt(handle, spectrum):
@@ -391,14 +781,16 @@ def export_plt(handle, spectrum):
     handle.write('set hidden3d\n')
     handle.write('set palette rgb 33,13,10\n')
     handle.write('splot "-" using 1:2:3 notitle with lines \n')
-    for plot in spectrum.iteritems():
+    for timeStamp, freqs, levels in iter_sweeps(spectrum):
         handle.write('\n')
-        for freq, pwr in plot[1].iteritems():
-            handle.write("{0} {1} {2}\n".format(freq, plot[0], pwr))
+        times = numpy.empty(len(freqs))
+        times.fill(timeStamp)
+        write_rows(handle, '%.12g %.12g %.7g\n', freqs, times, levels)
 
 
 def export_freemat(handle, spectrum):
-    x, y, z = create_mesh(spectrum, False)
+    freqs, times, levels = create_array_sorted(spectrum, True)
+    x, y, z = create_mesh_arrays(freqs, times, levels, False)
     write_numpy(handle, x, 'x')
     write_numpy(handle, y, 'y')
     write_numpy(handle, z, 'z')
@@ -426,34 +818,26 @@ def export_wwb(handle, spectrum):
                                                 len(spectrum))
     handle.write(header)
 
-    freqs = '\t\t<freq_set>\n'
-    for freq in spectrum[min(spectrum)]:
-        freqs += '\t\t\t<f>{}</f>\n'.format(freq * 1e3)
-    freqs += '\t\t</freq_set>\n'
-    handle.write(freqs)
+    freqs, _levels = split_spectrum_array(spectrum[min(spectrum)])
+    handle.write('\t\t<freq_set>\n')
+    write_rows(handle, '\t\t\t<f>%.12g</f>\n', freqs * 1e3)
+    handle.write('\t\t</freq_set>\n')
 
-    i = 0
-    for sweep in spectrum.items():
-        dataTime = datetime.datetime.utcfromtimestamp(sweep[0])
+    for i, (timeStamp, freqs, levels) in enumerate(iter_sweeps(spectrum)):
+        dataTime = datetime.datetime.utcfromtimestamp(timeStamp)
         dataSet = ('\t\t<data_set index="{}" freq_units="KHz" ampl_units="dBm" '
                    'start_freq="{}" stop_freq="{}" step_freq="{}" '
                    'res_bandwidth="TODO" scale_factor="1" '
                    'date="{}" time="{}" '
                    'date_time="{}">\n').format(i,
-                                               min(sweep[1]) * 1e3,
-                                               max(sweep[1]) * 1e3,
+                                               freqs[0] * 1e3,
+                                               freqs[-1] * 1e3,
                                                1.953125,
                                                dataTime.strftime('%a %b %d %Y'),
                                                dataTime.strftime('%H:%M:%S'),
-                                               sweep[0])
+                                               timeStamp)
         handle.write(dataSet)
-        i += 1
-
-        values = ''
-        for scan in sweep[1].items():
-            values += '\t\t\t<v>{:.1f}</v>\n'.format(scan[1])
-        handle.write(values)
-
+        write_rows(handle, '\t\t\t<v>%.1f</v>\n', levels)
         handle.write('\t\t</data_set>\n')
 
     handle.write('\t</data_sets>\n')
@@ -461,6 +845,20 @@ def export_wwb(handle, spectrum):
     handle.write('</scan_data_source>\n')
 
 
+def export_mat(handle, spectrum):
+    freqs, times, levels = create_array_sorted(spectrum)
+    write_mat(handle, freqs, 'freqs')
+    write_mat(handle, times, 'times')
+    write_mat(handle, levels, 'levels')
+
+
+def export_npz(handle, spectrum):
+    freqs, times, levels = create_array_sorted(spectrum)
+    buf = io.BytesIO()
+    numpy.savez_compressed(buf, freqs=freqs, times=times, levels=levels)
+    handle.write(buf.getvalue())
+
+
 def export_kmz(filename, bounds, image):
     tempPath = tempfile.mkdtemp()
 
@@ -545,18 +943,40 @@ def export_gpx(filename, locations, name):
     handle.close()
 
 
+def write_rows(handle, rowFormat, *columns):
+    rows = numpy.column_stack(columns)
+    if len(rows):
+        handle.write((rowFormat * len(rows)) % tuple(rows.ravel().tolist()))
+
+
 def write_numpy(handle, array, name):
     handle.write('{0}=[\n'.format(name))
-    for i in array:
-        for j in i:
-            handle.write('{0} '.format(j))
-        handle.write(';\n')
+    if array.size:
+        rowFormat = '%.12g ' * array.shape[1] + ';\n'
+        blockRows = max(1, 2 ** 18 // array.shape[1])
+        for i in xrange(0, len(array), blockRows):
+            block = array[i:i + blockRows]
+            handle.write((rowFormat * len(block)) %
+                         tuple(block.ravel().tolist()))
     handle.write(']\n')
 
 
+def write_mat(handle, array, name):
+    array = numpy.atleast_2d(numpy.asarray(array, numpy.float64))
+    rows, cols = array.shape
+    handle.write(struct.pack('<5i', 0, rows, cols, 0, len(name) + 1))
+    handle.write(name + '\0')
+    handle.write(array.tostring(order='F'))
+
+
 def extension_add(fileName, index, fileType):
-    _name, extCurrent = os.path.splitext(fileName)
+    name, extCurrent = os.path.splitext(fileName)
     ext = File.get_type_ext(index, fileType)
+    if fileType == File.Types.PLOT and extCurrent == File.GZIP:
+        _name, extCurrent = os.path.splitext(name)
+        if extCurrent != ext:
+            return name + ext + File.GZIP
+        return fileName
     if extCurrent != ext:
         return fileName + ext
 
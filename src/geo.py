@@ -0,0 +1,197 @@
+#
+# rtlsdr_scan
+#
+# http://eartoearoak.com/software/rtlsdr-scanner
+#
+# Copyright 2012 - 2014 Al Brown
+#
+# A frequency scanning GUI for the OsmoSDR rtl-sdr library at
+# http://sdr.osmocom.org/trac/wiki/rtl-sdr
+#
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import math
+
+from matplotlib import tri
+import numpy
+
+from constants import GeoInterp
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+
+class Interpolator(object):
+    GRIDS_MAX = 4
+    IDW_POWER = 2
+    IDW_NEIGHBOURS = 8
+
+    def __init__(self, x, y, z):
+        points = numpy.column_stack((x, y, z)).astype(numpy.float64)
+        points = points[numpy.lexsort((-points[:, 2], points[:, 1],
+                                       points[:, 0]))]
+        if len(points):
+            unique = numpy.ones(len(points), numpy.bool_)
+            unique[1:] = numpy.any(points[1:, :2] != points[:-1, :2], axis=1)
+            points = points[unique]
+        self.x = points[:, 0]
+        self.y = points[:, 1]
+        self.z = points[:, 2]
+
+        self.triangulation = None
+        self.tree = None
+        self.grids = {}
+
+    def __len__(self):
+        return len(self.z)
+
+    def get_extent(self):
+        return (self.x.min(), self.x.max(), self.y.min(), self.y.max())
+
+    def get_grid(self, method, resolution):
+        key = (method, resolution)
+        grid = self.grids.get(key)
+        if grid is None:
+            if len(self.grids) >= self.GRIDS_MAX:
+                self.grids.clear()
+            xMin, xMax, yMin, yMax = self.get_extent()
+            xi = numpy.linspace(xMin, xMax, resolution)
+            yi = numpy.linspace(yMin, yMax, resolution)
+            xGrid, yGrid = numpy.meshgrid(xi, yi)
+            if method == GeoInterp.IDW:
+                zi = self.__idw(xGrid, yGrid)
+            elif method == GeoInterp.NEAREST:
+                zi = self.__nearest(xGrid, yGrid)
+            else:
+                zi = self.__linear(xGrid, yGrid)
+            grid = (xi, yi, zi)
+            self.grids[key] = grid
+
+        return grid
+
+    def __get_triangulation(self):
+        if self.triangulation is None:
+            self.triangulation = tri.Triangulation(self.x, self.y)
+
+        return self.triangulation
+
+    def __linear(self, xGrid, yGrid):
+        interp = tri.LinearTriInterpolator(self.__get_triangulation(), self.z)
+
+        return interp(xGrid, yGrid)
+
+    def __query(self, xGrid, yGrid, count):
+        count = min(count, len(self.z))
+        points = numpy.column_stack((xGrid.ravel(), yGrid.ravel()))
+
+        if cKDTree is not None:
+            if self.tree is None:
+                self.tree = cKDTree(numpy.column_stack((self.x, self.y)))
+            distances, indices = self.tree.query(points, count)
+            if count == 1:
+                distances = distances[:, numpy.newaxis]
+                indices = indices[:, numpy.newaxis]
+            return distances, indices
+
+        return self.__query_cells(points, count)
+
+    def __query_cells(self, points, count):
+        xMin, xMax, yMin, yMax = self.get_extent()
+        cells = max(1, int(math.sqrt(len(self.z) / float(count))))
+        width = max((xMax - xMin) / cells, 1e-12)
+        height = max((yMax - yMin) / cells, 1e-12)
+        size = min(width, height)
+
+        def locate(xs, ys):
+            cellX = numpy.clip(((xs - xMin) / width).astype(numpy.intp),
+                               0, cells - 1)
+            cellY = numpy.clip(((ys - yMin) / height).astype(numpy.intp),
+                               0, cells - 1)
+            return cellX, cellY
+
+        cellX, cellY = locate(self.x, self.y)
+        keys = cellX * cells + cellY
+        order = numpy.argsort(keys, kind='mergesort')
+        bounds = numpy.searchsorted(keys[order], numpy.arange(cells * cells + 1))
+
+        queryX, queryY = locate(points[:, 0], points[:, 1])
+        queryKeys = queryX * cells + queryY
+        queryOrder = numpy.argsort(queryKeys, kind='mergesort')
+        queryKeys = queryKeys[queryOrder]
+        starts = numpy.flatnonzero(numpy.diff(queryKeys)) + 1
+        starts = numpy.concatenate(([0], starts, [len(queryKeys)]))
+
+        distances = numpy.empty((len(points), count))
+        indices = numpy.empty((len(points), count), numpy.intp)
+        for start, end in zip(starts[:-1], starts[1:]):
+            selected = queryOrder[start:end]
+            centreX, centreY = divmod(queryKeys[start], cells)
+            block = points[selected]
+            ring = 1
+            while True:
+                x0 = max(centreX - ring, 0)
+                x1 = min(centreX + ring, cells - 1)
+                y0 = max(centreY - ring, 0)
+                y1 = min(centreY + ring, cells - 1)
+                candidates = numpy.concatenate(
+                    [order[bounds[col * cells + y0]:bounds[col * cells + y1 + 1]]
+                     for col in xrange(x0, x1 + 1)])
+                full = x0 == 0 and y0 == 0 and \
+                    x1 == cells - 1 and y1 == cells - 1
+                if len(candidates) >= count:
+                    dist = ((block[:, 0, numpy.newaxis] - self.x[candidates]) ** 2 +
+                            (block[:, 1, numpy.newaxis] - self.y[candidates]) ** 2)
+                    if count < len(candidates):
+                        nearest = numpy.argpartition(dist, count - 1,
+                                                     axis=1)[:, :count]
+                    else:
+                        nearest = numpy.tile(numpy.arange(count),
+                                             (len(block), 1))
+                    rows = numpy.arange(len(block))[:, numpy.newaxis]
+                    found = numpy.sqrt(dist[rows, nearest])
+                    furthest = found.max()
+                    if full or furthest <= ring * size:
+                        distances[selected] = found
+                        indices[selected] = candidates[nearest]
+                        break
+                    ring = max(ring + 1, int(math.ceil(furthest / size)))
+                else:
+                    ring += 1
+
+        return distances, indices
+
+    def __nearest(self, xGrid, yGrid):
+        _distances, indices = self.__query(xGrid, yGrid, 1)
+
+        return self.z[indices[:, 0]].reshape(xGrid.shape)
+
+    def __idw(self, xGrid, yGrid):
+        distances, indices = self.__query(xGrid, yGrid, self.IDW_NEIGHBOURS)
+        values = self.z[indices]
+        exact = distances == 0
+        with numpy.errstate(divide='ignore'):
+            weights = 1. / distances ** self.IDW_POWER
+        weights[exact.any(axis=1)] = exact[exact.any(axis=1)]
+        zi = numpy.sum(weights * values, axis=1) / numpy.sum(weights, axis=1)
+
+        return zi.reshape(xGrid.shape)
+
+
+if __name__ == '__main__':
+    print 'Please run rtlsdr_scan.py'
+    exit(1)
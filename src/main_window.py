@@ -33,11 +33,12 @@ import time
 import webbrowser
 
 from matplotlib.dates import num2epoch
+import numpy
 import wx
 from wx.lib.masked import NumCtrl
 
 from constants import F_MIN, F_MAX, MODE, DWELL, NFFT, DISPLAY, Warn, \
-    Display, Cal, Mode, KML_PORT
+    Display, Cal, Mode, KML_PORT, SAMPLE_RATE
 from controls import MultiButton
 from devices import get_devices_rtl
 from dialogs import DialogProperties, DialogPrefs, DialogAdvPrefs, \
@@ -46,15 +47,19 @@ from dialogs import DialogProperties, DialogPrefs, DialogAdvPrefs, \
     DialogFormatting, DialogLog, DialogSats, DialogSysInfo
 from events import EVENT_THREAD, Event, EventThread, post_event, Log
 from file import save_plot, export_plot, open_plot, ScanInfo, export_image, \
-    export_map, extension_add, File, run_file, export_gpx
+    export_map, extension_add, File, run_file, export_gpx, ScanRecorder, \
+    open_scan, read_scan, read_scan_all
 from location import ThreadLocation, KmlServer
 from misc import RemoteControl, format_precision, calc_samples, calc_real_dwell, \
     get_version_timestamp, get_version_timestamp_repo, format_iso_time, limit
 from panels import PanelGraph
+from planner import calc_window
 from printer import PrintOut
-from scan import ThreadScan, anaylse_data, update_spectrum
+from scan import ThreadScan, ThreadSweep, SharedCapture, anaylse_data, \
+    update_spectrum
 from settings import Settings
-from spectrum import count_points, sort_spectrum, Extent
+from spectrum import count_points, sort_spectrum, Extent, SpectrumStore, \
+    split_spectrum_array
 from toolbars import Statusbar
 from utils_mpl import add_colours
 
@@ -86,10 +91,15 @@ class FrameMain(wx.Frame):
         self.lock = threading.Lock()
 
         self.sdr = None
+        self.sdrs = {}
         self.threadScan = None
         self.threadUpdate = None
         self.threadLocation = None
 
+        self.recorder = None
+        self.recordName = None
+        self.scanFile = None
+
         self.serverKml = None
 
         self.isNewScan = True
@@ -154,7 +164,7 @@ class FrameMain(wx.Frame):
         self.spinCtrlStop = None
         self.choiceDisplay = None
 
-        self.spectrum = {}
+        self.spectrum = SpectrumStore()
         self.scanInfo = ScanInfo()
         self.locations = {}
         self.lastLocation = [None] * 4
@@ -524,6 +534,8 @@ class FrameMain(wx.Frame):
             return
         self.spectrum.clear()
         self.locations.clear()
+        self.__close_scan()
+        self.recordName = None
         self.__saved(True)
         self.__set_plot(self.spectrum, False)
         self.graph.clear_selection()
@@ -561,7 +573,11 @@ class FrameMain(wx.Frame):
             fileName = extension_add(fileName, dlg.GetFilterIndex(),
                                      File.Types.SAVE)
             fullName = os.path.join(dirName, fileName)
-            save_plot(fullName, self.scanInfo, self.spectrum, self.locations)
+            save_plot(fullName, self.scanInfo, self.spectrum, self.locations,
+                      self.scanFile)
+            if self.scanFile is not None:
+                self.__close_scan()
+                self.scanFile = open_scan(fullName)
             self.__saved(True)
             self.status.set_general("Finished")
             self.settings.fileHistory.AddFileToHistory(fullName)
@@ -579,7 +595,7 @@ class FrameMain(wx.Frame):
             fileName = extension_add(fileName, dlg.GetFilterIndex(),
                                      File.Types.PLOT)
             fullName = os.path.join(dirName, fileName)
-            export_plot(fullName, dlg.GetFilterIndex(), self.spectrum)
+            export_plot(fullName, dlg.GetFilterIndex(), self.__get_spectrum())
             self.status.set_general("Finished")
         dlg.Destroy()
 
@@ -611,12 +627,13 @@ class FrameMain(wx.Frame):
         dlgFile.Destroy()
 
     def __on_export_image_seq(self, _event):
-        dlgSeq = DialogSeq(self, self.spectrum, self.settings)
+        dlgSeq = DialogSeq(self, self.spectrum, self.settings, self.scanFile)
         dlgSeq.ShowModal()
         dlgSeq.Destroy()
 
     def __on_export_geo(self, _event):
-        dlgGeo = DialogGeo(self, self.spectrum, self.locations, self.settings)
+        dlgGeo = DialogGeo(self, self.__get_spectrum(), self.locations,
+                           self.settings)
         if dlgGeo.ShowModal() == wx.ID_OK:
             self.status.set_general("Exporting...")
             extent = dlgGeo.get_extent()
@@ -687,9 +704,12 @@ class FrameMain(wx.Frame):
             self.pageConfig.SetPrintData(self.printConfig.GetPrintData())
 
     def __on_properties(self, _event):
-        if len(self.spectrum) > 0:
-            self.scanInfo.timeFirst = min(self.spectrum)
-            self.scanInfo.timeLast = max(self.spectrum)
+        times = self.spectrum.keys()
+        if self.scanFile is not None:
+            times += self.scanFile.get_times().tolist()
+        if len(times) > 0:
+            self.scanInfo.timeFirst = min(times)
+            self.scanInfo.timeLast = max(times)
 
         dlg = DialogProperties(self, self.scanInfo)
         dlg.ShowModal()
@@ -703,6 +723,7 @@ class FrameMain(wx.Frame):
         self.__scan_stop(False)
         self.__stop_gps(False)
         self.__stop_kml()
+        self.__close_scan()
         self.__get_controls()
         self.settings.devicesRtl = self.devicesRtl
         self.settings.save()
@@ -951,6 +972,8 @@ class FrameMain(wx.Frame):
         elif status == Event.STEPS:
             self.stepsTotal = (freq + 1) * 2
             self.steps = self.stepsTotal
+            self.status.set_info("Sweep time {0:.1f}s".format(data),
+                                 level=None)
             self.status.set_progress(0)
             self.status.show_progress()
         elif status == Event.CAL:
@@ -963,7 +986,7 @@ class FrameMain(wx.Frame):
                     self.scanInfo.tuner = data
         elif status == Event.DATA:
             self.__saved(False)
-            cal = self.devicesRtl[self.settings.indexRtl].calibration
+            cal = self.devicesRtl[data[2]].calibration
             self.pool.apply_async(anaylse_data,
                                   (freq, data, cal,
                                    self.settings.nfft,
@@ -975,6 +998,8 @@ class FrameMain(wx.Frame):
             self.__cleanup()
             self.status.set_general("Stopped")
         elif status == Event.FINISHED:
+            if self.threadScan is not None:
+                self.sdr = self.threadScan.get_sdr()
             self.threadScan = None
         elif status == Event.ERROR:
             self.__cleanup()
@@ -983,7 +1008,8 @@ class FrameMain(wx.Frame):
                 self.dlgCal.Destroy()
                 self.dlgCal = None
         elif status == Event.PROCESSED:
-            offset = self.settings.devicesRtl[self.settings.indexRtl].offset
+            offset = self.settings.devicesRtl[data[2]].offset
+            width = calc_window(SAMPLE_RATE, self.settings.passband, offset)
             if self.settings.alert:
                 alert = self.settings.alertLevel
             else:
@@ -991,7 +1017,7 @@ class FrameMain(wx.Frame):
             Thread(target=update_spectrum, name='Update',
                    args=(self, self.lock, self.settings.start,
                          self.settings.stop, freq,
-                         data, offset, self.spectrum,
+                         data, offset, width, self.spectrum,
                          not self.settings.retainScans,
                          alert)).start()
         elif status == Event.LEVEL:
@@ -1001,10 +1027,11 @@ class FrameMain(wx.Frame):
                 self.__set_plot(self.spectrum,
                                 self.settings.annotate and
                                 self.settings.retainScans and
-                                self.settings.mode == Mode.CONTIN)
+                                self.settings.mode == Mode.CONTIN,
+                                True)
             self.__progress()
         elif status == Event.DRAW:
-            self.graph.draw()
+            self.graph.draw(data)
         elif status == Event.VER_UPD:
             self.__update_checked(True, freq, data)
         elif status == Event.VER_NOUPD:
@@ -1029,9 +1056,11 @@ class FrameMain(wx.Frame):
         wx.YieldIfNeeded()
 
     def __on_process_done(self, data):
-        timeStamp, freq, scan = data
+        if data is None:
+            return
+        timeStamp, freq, scan, device = data
         post_event(self, EventThread(Event.PROCESSED, freq,
-                                     (timeStamp, scan)))
+                                     (timeStamp, scan, device)))
 
     def __auto_cal(self, status):
         freq = self.dlgCal.get_arg1()
@@ -1062,11 +1091,10 @@ class FrameMain(wx.Frame):
     def __calc_ppm(self, freq):
         with self.lock:
             timeStamp = max(self.spectrum)
-            spectrum = self.spectrum[timeStamp].copy()
+            freqs, levels = split_spectrum_array(self.spectrum[timeStamp])
 
-            for x, y in spectrum.iteritems():
-                spectrum[x] = (((x - freq) * (x - freq)) + 1) * y
-                peak = max(spectrum, key=spectrum.get)
+            weighted = ((freqs - freq) ** 2 + 1) * levels
+            peak = freqs[numpy.argmax(weighted)]
 
         return ((freq - peak) / freq) * 1e6
 
@@ -1080,6 +1108,7 @@ class FrameMain(wx.Frame):
             if self.isNewScan:
                 self.spectrum.clear()
                 self.locations.clear()
+                self.__close_scan()
                 self.graph.clear_plots()
 
                 self.isNewScan = False
@@ -1089,11 +1118,24 @@ class FrameMain(wx.Frame):
                 self.scanInfo.lat = None
                 self.scanInfo.lon = None
                 self.scanInfo.desc = ''
+                self.__record_start()
+            elif self.recorder is None:
+                self.__record_start(True)
 
             self.stopAtEnd = False
             self.stopScan = False
-            self.threadScan = ThreadScan(self, self.sdr, self.settings,
-                                         self.settings.indexRtl, samples, isCal)
+            devices = [i for i, device in enumerate(self.devicesRtl)
+                       if device.sweep]
+            if len(devices) > 1 and not isCal:
+                if self.sdr is not None:
+                    self.sdr.close()
+                    self.sdr = None
+                self.threadScan = ThreadSweep(self, self.settings, devices,
+                                              samples, self.sdrs)
+            else:
+                self.threadScan = ThreadScan(self, self.sdr, self.settings,
+                                             self.settings.indexRtl, samples,
+                                             isCal)
             self.filename = "Scan {0:.1f}-{1:.1f}MHz".format(self.settings.start,
                                                              self.settings.stop)
             self.graph.set_plot_title()
@@ -1109,8 +1151,9 @@ class FrameMain(wx.Frame):
             if join:
                 self.threadScan.join()
         self.threadScan = None
-        if self.sdr is not None:
-            self.sdr.close()
+        self.__sdr_close()
+        SharedCapture.remove_captures()
+        self.__record_stop()
         self.__set_control_state(True)
 
     def __progress(self):
@@ -1124,6 +1167,8 @@ class FrameMain(wx.Frame):
         else:
             self.status.hide_progress()
             self.__set_plot(self.spectrum, self.settings.annotate)
+            if not self.stopScan:
+                self.__record()
             if self.stopScan:
                 self.status.set_general("Stopped")
                 self.__cleanup()
@@ -1140,9 +1185,8 @@ class FrameMain(wx.Frame):
                         self.__cleanup()
 
     def __cleanup(self):
-        if self.sdr is not None:
-            self.sdr.close()
-            self.sdr = None
+        self.__sdr_close()
+        SharedCapture.remove_captures()
 
         self.status.hide_progress()
         self.steps = 0
@@ -1151,6 +1195,66 @@ class FrameMain(wx.Frame):
         self.stopAtEnd = False
         self.stopScan = True
         self.isScanning = False
+        self.__record_stop()
+
+    def __sdr_close(self):
+        if self.sdr is not None:
+            self.sdr.close()
+            self.sdr = None
+        for sdr in self.sdrs.values():
+            sdr.close()
+        self.sdrs.clear()
+
+    def __record_start(self, resume=False):
+        self.__record_stop()
+        if self.settings.mode == Mode.CONTIN and self.settings.recordScans:
+            if not resume or self.recordName is None:
+                name = "Scan {0:.1f}-{1:.1f}MHz {2}.rfs"
+                name = name.format(self.settings.start, self.settings.stop,
+                                   time.strftime('%Y%m%d-%H%M%S'))
+                self.recordName = os.path.join(self.settings.dirScans, name)
+            self.recorder = ScanRecorder(self.recordName, self.scanInfo)
+
+    def __record(self):
+        if self.recorder is None or not len(self.spectrum):
+            return
+        error = self.recorder.error
+        if error is not None:
+            self.__record_stop()
+            self.status.set_general("Recording stopped: {0}".format(error.strerror),
+                                    level=Log.ERROR)
+            return
+        with self.lock:
+            timeStamp = max(self.spectrum)
+            location = self.locations.get(timeStamp)
+            self.recorder.record(self.spectrum, timeStamp, location)
+
+    def __record_stop(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recordName = self.recorder.filename
+            self.recorder = None
+
+    def __get_spectrum(self):
+        if self.scanFile is None:
+            return self.spectrum
+
+        total = len(set(self.spectrum.keys()) |
+                    set(self.scanFile.get_times().tolist()))
+        spectrum = read_scan_all(self.scanFile, self.spectrum, self.locations)
+        if spectrum is None:
+            spectrum = self.spectrum
+        if len(spectrum) < total:
+            message = 'Only {0} of {1} sweeps could be read'.format(len(spectrum),
+                                                                   total)
+            wx.MessageBox(message, 'Warning', wx.OK | wx.ICON_WARNING)
+
+        return spectrum
+
+    def __close_scan(self):
+        if self.scanFile is not None:
+            self.scanFile.close()
+            self.scanFile = None
 
     def __remove_last(self, data):
         while len(data) >= self.settings.retainMax:
@@ -1209,9 +1313,11 @@ class FrameMain(wx.Frame):
 
         with self.lock:
             if len(self.spectrum) > 0:
-                self.locations[max(self.spectrum)] = (data[0],
-                                                      data[1],
-                                                      data[2])
+                timeStamp = max(self.spectrum)
+                self.locations[timeStamp] = (data[0],
+                                             data[1],
+                                             data[2])
+                self.spectrum.set_location(timeStamp, data)
 
     def __saved(self, isSaved):
         self.isSaved = isSaved
@@ -1220,16 +1326,17 @@ class FrameMain(wx.Frame):
             title += "*"
         self.SetTitle(title)
 
-    def __set_plot(self, spectrum, annotate):
+    def __set_plot(self, spectrum, annotate, live=False):
         if len(spectrum) > 0:
-            total = count_points(spectrum)
-            if total > 0:
-                spectrum = sort_spectrum(spectrum)
+            with self.lock:
+                total = count_points(spectrum)
                 extent = Extent(spectrum)
+                spectrum = sort_spectrum(spectrum)
+            if total > 0:
                 self.graph.set_plot(spectrum,
                                     self.settings.pointsLimit,
                                     self.settings.pointsMax,
-                                    extent, annotate)
+                                    extent, annotate, live)
         else:
             self.graph.clear_plots()
 
@@ -1407,9 +1514,18 @@ class FrameMain(wx.Frame):
         self.settings.dirScans = dirname
         self.status.set_general("Opening: {0}".format(filename))
 
-        self.scanInfo, spectrum, location = open_plot(dirname, filename)
+        scanFile = open_scan(os.path.join(dirname, filename))
+        if scanFile is not None:
+            self.scanInfo, spectrum, location = read_scan(scanFile,
+                                                          self.settings.retainMax)
+            if spectrum is None:
+                scanFile.close()
+            else:
+                self.scanFile = scanFile
+        else:
+            self.scanInfo, spectrum, location = open_plot(dirname, filename)
 
-        if len(spectrum) > 0:
+        if spectrum is not None and len(spectrum) > 0:
             self.scanInfo.set_to_settings(self.settings)
             self.spectrum = spectrum
             self.locations.clear()
@@ -1419,7 +1535,12 @@ class FrameMain(wx.Frame):
             self.__set_control_state(True)
             self.__set_plot(spectrum, self.settings.annotate)
             self.graph.scale_plot(True)
-            self.status.set_general("Finished")
+            if self.scanFile is not None and \
+                    len(self.scanFile.get_times()) > len(spectrum):
+                self.status.set_general("Showing latest {0} of {1} sweeps".format(
+                    len(spectrum), len(self.scanFile.get_times())))
+            else:
+                self.status.set_general("Finished")
             self.settings.fileHistory.AddFileToHistory(os.path.join(dirname,
                                                                     filename))
         else:
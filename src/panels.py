@@ -23,8 +23,6 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
-import copy
-
 from matplotlib import cm
 import matplotlib
 from matplotlib.backends.backend_wxagg import \
@@ -60,6 +58,7 @@ class PanelGraph(wx.Panel):
         self.limit = None
         self.extent = None
         self.annotate = None
+        self.live = False
 
         self.mouseSelect = None
         self.mouseZoom = None
@@ -76,6 +75,7 @@ class PanelGraph(wx.Panel):
         self.show = None
 
         self.doDraw = False
+        self.doBlit = False
 
         wx.Panel.__init__(self, panel)
 
@@ -143,18 +143,29 @@ class PanelGraph(wx.Panel):
             self.__draw_overlay()
 
     def __on_idle(self, _event):
-        if self.doDraw and self.plot.get_plot_thread() is None:
+        if self.plot.get_plot_thread() is not None:
+            return
+        if self.doDraw or (self.doBlit and self.background is None):
             self.__hide_overlay()
             self.canvas.draw()
             self.doDraw = False
+            self.doBlit = False
+        elif self.doBlit:
+            self.__draw_overlay()
+            self.doBlit = False
 
     def __on_timer(self, _event):
         self.timer.Stop()
-        self.set_plot(None, None, None, None, self.annotate)
+        self.set_plot(None, None, None, None, self.annotate, self.live)
+
+    def __on_zoom(self):
+        if self.isLimited:
+            self.redraw_plot()
 
     def __draw_overlay(self):
         if self.background is not None:
             self.canvas.restore_region(self.background)
+            self.__draw_animated()
             self.__draw_select()
             self.draw_measure()
             axes = self.plot.get_axes()
@@ -163,6 +174,13 @@ class PanelGraph(wx.Panel):
             else:
                 self.canvas.blit(axes.bbox)
 
+    def __draw_animated(self):
+        axes = self.plot.get_axes()
+        if axes is not None:
+            for artist in axes.get_children():
+                if artist.get_animated() and artist.get_visible():
+                    axes.draw_artist(artist)
+
     def __draw_select(self):
         if self.selectStart is not None and self.selectEnd is not None:
             self.mouseSelect.draw(self.selectStart, self.selectEnd)
@@ -202,7 +220,8 @@ class PanelGraph(wx.Panel):
         self.redraw_plot()
         self.plot.scale_plot(True)
         self.mouseZoom = MouseZoom(self.toolbar, plot=self.plot,
-                                   callbackHide=self.__hide_overlay)
+                                   callbackHide=self.__hide_overlay,
+                                   callbackZoom=self.__on_zoom)
         self.mouseSelect = MouseSelect(self.plot, self.on_select,
                                        self.on_selected)
         self.measureTable.show(self.settings.showMeasure)
@@ -221,29 +240,38 @@ class PanelGraph(wx.Panel):
         self.menuClearSelect.append(menu)
         menu.Enable(False)
 
-    def draw(self):
-        self.doDraw = True
+    def draw(self, blit=False):
+        if blit:
+            self.doBlit = True
+        else:
+            self.doDraw = True
 
     def show_measure_table(self, show):
         self.measureTable.show(show)
         self.Layout()
 
-    def set_plot(self, spectrum, isLimited, limit, extent, annotate=False):
+    def set_plot(self, spectrum, isLimited, limit, extent, annotate=False,
+                 live=False):
         if spectrum is not None and extent is not None:
             if isLimited is not None and limit is not None:
-                self.spectrum = copy.copy(spectrum)
+                self.spectrum = spectrum
                 self.extent = extent
                 self.annotate = annotate
                 self.isLimited = isLimited
                 self.limit = limit
+                self.live = live
 
         if self.plot.get_plot_thread() is None:
             self.timer.Stop()
             self.measureTable.set_selected(self.spectrum, self.selectStart,
                                            self.selectEnd)
-            if isLimited:
-                spectrum = reduce_points(spectrum, limit)
-            self.plot.set_plot(self.spectrum, self.extent, annotate)
+            spectrum = self.spectrum
+            if spectrum is not None and self.isLimited and \
+               self.settings.display == Display.PLOT:
+                axes = self.plot.get_axes()
+                spectrum = reduce_points(spectrum, self.limit,
+                                         axes.get_xlim(), axes.bbox.width)
+            self.plot.set_plot(spectrum, self.extent, annotate, live)
 
         else:
             self.timer.Start(200, oneShot=True)
@@ -567,9 +595,6 @@ class PanelMeasure(wx.Panel):
                          'Mean': (0, 9),
                          'GMean': (1, 9),
                          'Flatness': (2, 9),
-                         '-3dB Start': (0, 13),
-                         '-3dB End': (1, 13),
-                         '-3dB Delta': (2, 13),
                          'OBW Start': (0, 17),
                          'OBW End': (1, 17),
                          'OBW Delta': (2, 17)}
@@ -634,14 +659,9 @@ class PanelMeasure(wx.Panel):
         toolTips[self.locsMeasure['avg']] = 'Mean power (dB)'
         toolTips[self.locsMeasure['gmean']] = 'Geometric mean power (dB)'
         toolTips[self.locsMeasure['flat']] = 'Spectral flatness'
-        toolTips[self.locsMeasure['hbwstart']] = '-3db start location (MHz)'
-        toolTips[self.locsMeasure['hbwend']] = '-3db end location (MHz)'
-        toolTips[self.locsMeasure['hbwdelta']] = '-3db bandwidth (MHz)'
-        toolTips[self.locsMeasure['obwstart']] = '99% start location (MHz)'
-        toolTips[self.locsMeasure['obwend']] = '99% end location (MHz)'
-        toolTips[self.locsMeasure['obwdelta']] = '99% bandwidth (MHz)'
 
         self.toolTips = GridToolTips(self.grid, toolTips)
+        self.__set_bandwidth_descs()
 
         self.popupMenu = wx.Menu()
         self.popupMenuCopy = self.popupMenu.Append(wx.ID_ANY, "&Copy",
@@ -664,6 +684,25 @@ class PanelMeasure(wx.Panel):
             self.grid.SetCellValue(row, col, desc)
             self.grid.SetCellFont(row, col, font)
 
+    def __set_bandwidth_descs(self):
+        font = self.grid.GetCellFont(0, 0)
+        font.SetWeight(wx.BOLD)
+
+        level = '-{0:g}dB'.format(self.settings.bandwidthDb)
+        for desc, row in [('Start', 0), ('End', 1), ('Delta', 2)]:
+            self.grid.SetCellValue(row, 13, '{0} {1}'.format(level, desc))
+            self.grid.SetCellFont(row, 13, font)
+        self.grid.AutoSizeColumn(13)
+
+        percent = '{0:g}%'.format(self.settings.obwPercent)
+        toolTips = self.toolTips.toolTips
+        toolTips[self.locsMeasure['hbwstart']] = level + ' start location (MHz)'
+        toolTips[self.locsMeasure['hbwend']] = level + ' end location (MHz)'
+        toolTips[self.locsMeasure['hbwdelta']] = level + ' bandwidth (MHz)'
+        toolTips[self.locsMeasure['obwstart']] = percent + ' start location (MHz)'
+        toolTips[self.locsMeasure['obwend']] = percent + ' end location (MHz)'
+        toolTips[self.locsMeasure['obwdelta']] = percent + ' bandwidth (MHz)'
+
     def __set_check_editor(self):
         for _desc, (row, col) in self.locsCheck.iteritems():
             self.grid.SetCellEditor(row, col, wxGrid.GridCellBoolEditor())
@@ -765,7 +804,9 @@ class PanelMeasure(wx.Panel):
         self.measure = None
 
     def set_selected(self, spectrum, start, end):
-        self.measure = Measure(spectrum, start, end)
+        self.measure = Measure(spectrum, start, end,
+                               self.settings.bandwidthDb,
+                               self.settings.obwPercent)
         if not self.measure.is_valid():
             self.clear_measurement()
             return
@@ -878,6 +919,7 @@ class PanelMeasure(wx.Panel):
             self.__set_check_read_only(Measure.HBW, False)
             self.__set_check_read_only(Measure.OBW, False)
 
+        self.__set_bandwidth_descs()
         self.grid.Refresh()
 
 
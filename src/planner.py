@@ -0,0 +1,138 @@
+#
+# rtlsdr_scan
+#
+# http://eartoearoak.com/software/rtlsdr-scanner
+#
+# Copyright 2012 - 2014 Al Brown
+#
+# A frequency scanning GUI for the OsmoSDR rtl-sdr library at
+# http://sdr.osmocom.org/trac/wiki/rtl-sdr
+#
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import math
+
+from constants import SAMPLE_RATE
+
+
+class ScanPlan(object):
+    TUNE_TIME = 0.005
+    MARGIN = 1e3
+
+    def __init__(self, start, stop, offset, samples, sampleRate=SAMPLE_RATE,
+                 passband=0.75, settle=0, nfft=None, origin=None):
+        self.start = start
+        self.stop = stop
+        self.offset = offset
+        self.samples = samples
+        self.sampleRate = sampleRate
+        self.settle = settle
+        if nfft:
+            self.binWidth = float(sampleRate) / nfft
+        else:
+            self.binWidth = None
+        if origin is None:
+            origin = start
+        self.origin = origin
+        self.width = calc_window(sampleRate, passband, offset)
+        self.hop = self.__calc_hop()
+        self.freqs = self.__calc_freqs()
+
+    def __align(self, freq, origin=0):
+        if self.binWidth is None:
+            return freq
+        bins = round((freq - origin) / self.binWidth)
+
+        return origin + bins * self.binWidth
+
+    def __calc_hop(self):
+        width = self.width
+        margin = min(self.MARGIN, width / 10.)
+        if self.binWidth is None:
+            hop = width * 2
+            resolution = width / 1000.
+        else:
+            resolution = self.binWidth
+            hop = math.floor(width * 2 / resolution) * resolution
+        while hop > width - margin:
+            span = (2 * self.offset + width) % hop
+            if hop - width + margin <= span <= width - margin:
+                return hop
+            hop -= resolution
+
+        if self.binWidth is None:
+            return width - margin
+        return max(math.floor((width - margin) / resolution), 1) * resolution
+
+    def __get_bands(self, freq):
+        return [(freq - self.offset - self.width, freq - self.offset),
+                (freq + self.offset, freq + self.offset + self.width)]
+
+    def __is_covered(self, freqs):
+        bands = []
+        for freq in freqs:
+            bands.extend(self.__get_bands(freq))
+        bands.sort()
+
+        covered = self.start
+        for bandStart, bandEnd in bands:
+            if bandStart > covered:
+                break
+            covered = max(covered, bandEnd)
+            if covered >= self.stop:
+                return True
+
+        return False
+
+    def __calc_freqs(self):
+        anchor = self.__align(self.start + self.offset + self.width,
+                              self.origin)
+        first = int(math.floor((self.start - self.offset - self.width - anchor)
+                               / self.hop))
+        last = int(math.ceil((self.stop + self.offset + self.width - anchor)
+                             / self.hop))
+        freqs = [anchor + i * self.hop for i in range(first, last + 1)]
+
+        while len(freqs) > 1 and self.__is_covered(freqs[1:]):
+            freqs.pop(0)
+        while len(freqs) > 1 and self.__is_covered(freqs[:-1]):
+            freqs.pop()
+
+        return freqs
+
+    def get_freqs(self):
+        return self.freqs
+
+    def get_steps(self):
+        return len(self.freqs)
+
+    def get_width(self):
+        return self.width
+
+    def get_sweep_time(self):
+        dwell = float(self.samples + self.settle) / self.sampleRate
+        return len(self.freqs) * (dwell + self.TUNE_TIME)
+
+
+def calc_window(sampleRate, passband, offset):
+    width = sampleRate * passband / 2. - offset
+
+    return max(width, sampleRate * passband / 8.)
+
+
+if __name__ == '__main__':
+    print 'Please run rtlsdr_scan.py'
+    exit(1)
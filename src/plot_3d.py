@@ -23,6 +23,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+import math
 import threading
 import time
 
@@ -34,10 +35,11 @@ from matplotlib.dates import DateFormatter
 from matplotlib.gridspec import GridSpec
 from matplotlib.ticker import ScalarFormatter, AutoMinorLocator
 from mpl_toolkits.mplot3d import Axes3D  # @UnresolvedImport @UnusedImport
+import numpy
 
 from events import post_event, EventThread, Event
 from misc import format_time, format_precision
-from spectrum import create_mesh
+from spectrum import SpectrumStore, create_array, create_mesh_arrays
 from utils_mpl import utc_to_mpl
 
 
@@ -52,6 +54,7 @@ class Plotter3d(object):
         self.plot = None
         self.extent = None
         self.threadPlot = None
+        self.surface = Surface()
         self.wireframe = settings.wireframe
         self.__setup_plot()
         self.set_grid(settings.grid)
@@ -124,7 +127,7 @@ class Plotter3d(object):
     def set_title(self, title):
         self.axes.set_title(title, fontsize='medium')
 
-    def set_plot(self, spectrum, extent, annotate=False):
+    def set_plot(self, spectrum, extent, annotate=False, _live=False):
         self.extent = extent
         self.threadPlot = ThreadPlot(self, self.settings,
                                      self.axes,
@@ -172,6 +175,7 @@ class ThreadPlot(threading.Thread):
         self.retainMax = settings.retainMax
         self.colourMap = settings.colourMap
         self.autoL = settings.autoL
+        self.polysMax = settings.polysMax
         self.barBase = barBase
         self.annotate = annotate
 
@@ -182,7 +186,8 @@ class ThreadPlot(threading.Thread):
 
         total = len(self.data)
         if total > 0:
-            x, y, z = create_mesh(self.data, True)
+            x, y, z = self.parent.surface.create_mesh(self.data,
+                                                      self.polysMax)
             self.parent.clear_plots()
 
             if self.autoL:
@@ -254,6 +259,59 @@ class ThreadPlot(threading.Thread):
                     child.remove()
 
 
+class Surface(object):
+    def __init__(self):
+        self.freqs = None
+        self.factor = None
+        self.rows = {}
+
+    def __decimate(self, levels, factor):
+        if factor == 1:
+            return levels
+        width = levels.shape[-1]
+        blocks = int(math.ceil(float(width) / factor))
+        padded = numpy.empty(levels.shape[:-1] + (blocks * factor,))
+        padded.fill(-numpy.inf)
+        padded[..., :width] = numpy.where(numpy.isnan(levels), -numpy.inf,
+                                          levels)
+        padded = padded.reshape(levels.shape[:-1] + (-1, factor)).max(axis=-1)
+        padded[numpy.isneginf(padded)] = numpy.nan
+
+        return padded
+
+    def create_mesh(self, spectrum, polysMax):
+        freqs, levels = create_array(spectrum)
+        times = numpy.array(spectrum.keys(), numpy.float64)
+        width = len(freqs)
+        total = len(times)
+        factor = int(math.ceil(float(width * total) / max(1, polysMax)))
+        factor = max(1, min(factor, width / 2))
+
+        if not numpy.array_equal(self.freqs, freqs) or self.factor != factor:
+            self.freqs = freqs
+            self.factor = factor
+            self.rows = {}
+
+        if isinstance(spectrum, SpectrumStore):
+            versions = spectrum.get_versions().tolist()
+            rows = {}
+            zs = []
+            for timeStamp, version, sweep in zip(times.tolist(), versions,
+                                                 levels):
+                key = (timeStamp, version)
+                row = self.rows.get(key)
+                if row is None:
+                    row = self.__decimate(sweep, factor)
+                rows[key] = row
+                zs.append(row)
+            self.rows = rows
+            zs = numpy.array(zs)
+        else:
+            zs = self.__decimate(levels, factor)
+
+        return create_mesh_arrays(freqs[::factor], times, zs, True)
+
+
 if __name__ == '__main__':
     print 'Please run rtlsdr_scan.py'
     exit(1)
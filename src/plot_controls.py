@@ -32,7 +32,8 @@ from plot_status import PlotterStatus
 class MouseZoom():
     SCALE_STEP = 1.3
 
-    def __init__(self, toolbar, figure=None, plot=None, callbackHide=None):
+    def __init__(self, toolbar, figure=None, plot=None, callbackHide=None,
+                 callbackZoom=None):
         if figure is None:
             if isinstance(plot, Plotter3d) or isinstance(plot, PlotterStatus):
                 return
@@ -44,6 +45,7 @@ class MouseZoom():
             self.figure = figure
 
         self.callbackHide = callbackHide
+        self.callbackZoom = callbackZoom
         self.toolbar = toolbar
         self.figure.canvas.mpl_connect('scroll_event', self.__zoom)
 
@@ -85,6 +87,9 @@ class MouseZoom():
         self.toolbar.push_current()
         self.figure.canvas.draw()
 
+        if self.callbackZoom is not None:
+            self.callbackZoom()
+
 
 class MouseSelect():
     def __init__(self, plot, callbackPre, callbackPost):
@@ -23,7 +23,6 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
-from collections import OrderedDict
 import threading
 
 from matplotlib import patheffects
@@ -41,7 +40,7 @@ import numpy
 from constants import Markers, PlotFunc
 from events import EventThread, Event, post_event
 from misc import format_precision
-from spectrum import Measure
+from spectrum import Measure, create_array, split_spectrum_array
 
 
 class Plotter(object):
@@ -55,6 +54,8 @@ class Plotter(object):
         self.barBase = None
         self.threadPlot = None
         self.extent = None
+        self.live = False
+        self.collections = {}
         self.lines = {}
         self.labels = {}
         self.overflowLabels = {}
@@ -324,9 +325,9 @@ class Plotter(object):
                 except:
                     pass
 
-    def redraw_plot(self):
+    def redraw_plot(self, blit=False):
         if self.figure is not None:
-            post_event(self.notify, EventThread(Event.DRAW))
+            post_event(self.notify, EventThread(Event.DRAW, None, blit))
 
     def get_axes(self):
         return self.axes
@@ -340,14 +341,15 @@ class Plotter(object):
     def set_title(self, title):
         self.axes.set_title(title, fontsize='medium')
 
-    def set_plot(self, spectrum, extent, annotate=False):
+    def set_plot(self, spectrum, extent, annotate=False, live=False):
         self.extent = extent
         self.threadPlot = ThreadPlot(self, self.settings,
                                      self.axes,
                                      spectrum,
                                      self.extent,
                                      self.barBase,
-                                     annotate)
+                                     annotate,
+                                     live)
         self.threadPlot.start()
 
         return self.threadPlot
@@ -358,6 +360,8 @@ class Plotter(object):
             if child.get_gid() is not None:
                 if child.get_gid() == "plot" or child.get_gid() == "peak":
                     child.remove()
+        self.collections = {}
+        self.live = False
 
     def set_grid(self, on):
         self.axes.grid(on)
@@ -412,7 +416,7 @@ class Plotter(object):
 
 class ThreadPlot(threading.Thread):
     def __init__(self, parent, settings, axes, data, extent,
-                 barBase, annotate):
+                 barBase, annotate, live):
         threading.Thread.__init__(self)
         self.name = "Plot"
         self.parent = parent
@@ -427,6 +431,7 @@ class ThreadPlot(threading.Thread):
         self.annotate = annotate
         self.fade = settings.fadeScans
         self.plotFunc = settings.plotFunc
+        self.live = live and self.plotFunc == PlotFunc.NONE
 
     def run(self):
         if self.data is None:
@@ -435,7 +440,13 @@ class ThreadPlot(threading.Thread):
 
         total = len(self.data)
         if total > 0:
-            self.parent.clear_plots()
+            blit = self.live and self.parent.live
+            if self.live:
+                self.__clear_markers()
+            else:
+                self.parent.clear_plots()
+            self.parent.live = self.live
+            limits = self.__get_limits()
 
             if self.plotFunc == PlotFunc.NONE:
                 peakF, peakL = self.__plot_all()
@@ -452,39 +463,41 @@ class ThreadPlot(threading.Thread):
                 self.__annotate_plot(peakF, peakL)
 
             self.parent.scale_plot()
-            self.parent.redraw_plot()
+            if limits != self.__get_limits():
+                blit = False
+            self.parent.redraw_plot(blit)
 
         self.parent.threadPlot = None
 
-    def __calc_min(self):
-        points = OrderedDict()
+    def __calc_levels(self):
+        freqs, levels = create_array(self.data)
+        columns = (~numpy.isnan(levels)).any(axis=0)
 
-        for timeStamp in self.data:
-            for x, y in self.data[timeStamp].items():
-                if x in points:
-                    points[x] = min(points[x], y)
-                else:
-                    points[x] = y
+        return freqs[columns], levels[:, columns]
 
-        return points
+    def __calc_min(self):
+        freqs, levels = self.__calc_levels()
 
-    def __calc_max(self):
-        points = OrderedDict()
+        return freqs, numpy.nanmin(levels, axis=0)
 
-        for timeStamp in self.data:
-            for x, y in self.data[timeStamp].items():
-                if x in points:
-                    points[x] = max(points[x], y)
-                else:
-                    points[x] = y
+    def __calc_max(self):
+        freqs, levels = self.__calc_levels()
 
-        return points
+        return freqs, numpy.nanmax(levels, axis=0)
 
     def __plot_all(self):
         total = len(self.data)
         count = 0.0
+        collections = self.parent.collections
+        for timeStamp in collections.keys():
+            if timeStamp not in self.data:
+                collections.pop(timeStamp)[0].remove()
+
+        norm = self.__get_norm(self.autoL, self.extent)
+        peakF, peakL = self.extent.get_peak_fl()
         for timeStamp in self.data:
-            if len(self.data[timeStamp]) < 2:
+            points = len(self.data[timeStamp])
+            if points < 2:
                 self.parent.threadPlot = None
                 return None, None
 
@@ -493,82 +506,68 @@ class ThreadPlot(threading.Thread):
             else:
                 alpha = 1
 
-            data = self.data[timeStamp].items()
-            peakF, peakL = self.extent.get_peak_fl()
-
-            segments, levels = self.__create_segments(data)
-            lc = LineCollection(segments)
-            lc.set_array(numpy.array(levels))
-            lc.set_norm(self.__get_norm(self.autoL, self.extent))
-            lc.set_cmap(self.colourMap)
-            lc.set_linewidth(self.lineWidth)
-            lc.set_gid('plot')
-            lc.set_alpha(alpha)
-            self.axes.add_collection(lc)
+            if timeStamp in collections:
+                lc, size = collections[timeStamp]
+            else:
+                lc = LineCollection([])
+                lc.set_cmap(self.colourMap)
+                lc.set_linewidth(self.lineWidth)
+                lc.set_gid('plot')
+                self.axes.add_collection(lc)
+                size = None
+
+            if count == 0 or size != points:
+                freqs, levels = split_spectrum_array(self.data[timeStamp])
+                segments, levels = self.__create_segments(freqs, levels)
+                lc.set_segments(segments)
+                lc.set_array(levels)
+            lc.set_norm(norm)
+            if lc.get_alpha() != alpha:
+                lc.set_alpha(alpha)
+            lc.set_animated(self.live)
+            collections[timeStamp] = [lc, points]
             count += 1
 
         return peakF, peakL
 
     def __plot_min(self):
-        points = self.__calc_min()
+        freqs, levels = self.__calc_min()
 
-        return self.__plot_single(points)
+        return self.__plot_single(freqs, levels)
 
     def __plot_max(self):
-        points = self.__calc_max()
+        freqs, levels = self.__calc_max()
 
-        return self.__plot_single(points)
+        return self.__plot_single(freqs, levels)
 
     def __plot_avg(self):
-        points = OrderedDict()
-
         for timeStamp in self.data:
             if len(self.data[timeStamp]) < 2:
                 return None, None
 
-            for x, y in self.data[timeStamp].items():
-                if x in points:
-                    points[x] = (points[x] + y) / 2
-                else:
-                    points[x] = y
+        freqs, levels = self.__calc_levels()
 
-        return self.__plot_single(points)
+        return self.__plot_single(freqs, numpy.nanmean(levels, axis=0))
 
     def __plot_variance(self):
-        pointsMin = self.__calc_min()
-        pointsMax = self.__calc_max()
-
-        polys = []
-        variance = []
-        varMin = 1000
-        varMax = 0
-        lastX = None
-        lastYMin = None
-        lastYMax = None
-        for x in pointsMin.iterkeys():
-            if lastX is None:
-                lastX = x
-            if lastYMin is None:
-                lastYMin = pointsMin[x]
-            if lastYMax is None:
-                lastYMax = pointsMax[x]
-            polys.append([[x, pointsMin[x]],
-                          [x, pointsMax[x]],
-                          [lastX, lastYMax],
-                          [lastX, lastYMin],
-                          [x, pointsMin[x]]])
-            lastX = x
-            lastYMin = pointsMin[x]
-            lastYMax = pointsMax[x]
-
-            var = pointsMax[x] - pointsMin[x]
-            variance.append(var)
-            varMin = min(varMin, var)
-            varMax = max(varMax, var)
-
-        norm = Normalize(vmin=varMin, vmax=varMax)
+        freqs, levels = self.__calc_levels()
+        if len(freqs) < 2:
+            return None, None
+
+        levelsMin = numpy.nanmin(levels, axis=0)
+        levelsMax = numpy.nanmax(levels, axis=0)
+        corners = [(freqs[1:], levelsMin[1:]),
+                   (freqs[1:], levelsMax[1:]),
+                   (freqs[:-1], levelsMax[:-1]),
+                   (freqs[:-1], levelsMin[:-1]),
+                   (freqs[1:], levelsMin[1:])]
+        polys = numpy.stack([numpy.stack(corner, axis=1)
+                             for corner in corners], axis=1)
+        variance = levelsMax - levelsMin
+
+        norm = Normalize(vmin=variance.min(), vmax=variance.max())
         sm = ScalarMappable(norm, self.colourMap)
-        colours = sm.to_rgba(variance)
+        colours = sm.to_rgba(variance[1:])
 
         pc = PolyCollection(polys)
         pc.set_gid('plot')
@@ -578,13 +577,16 @@ class ThreadPlot(threading.Thread):
 
         return None, None
 
-    def __plot_single(self, points):
-        data = points.items()
-        peakF, peakL = max(data, key=lambda item: item[1])
+    def __plot_single(self, freqs, levels):
+        if len(freqs) < 2:
+            return None, None
 
-        segments, levels = self.__create_segments(data)
+        peak = levels.argmax()
+        peakF, peakL = float(freqs[peak]), float(levels[peak])
+
+        segments, levels = self.__create_segments(freqs, levels)
         lc = LineCollection(segments)
-        lc.set_array(numpy.array(levels))
+        lc.set_array(levels)
         lc.set_norm(self.__get_norm(self.autoL, self.extent))
         lc.set_cmap(self.colourMap)
         lc.set_linewidth(self.lineWidth)
@@ -593,16 +595,10 @@ class ThreadPlot(threading.Thread):
 
         return peakF, peakL
 
-    def __create_segments(self, points):
-        segments = []
-        levels = []
-
-        prev = points[0]
-        for point in points:
-            segment = [prev, point]
-            segments.append(segment)
-            levels.append((point[1] + prev[1]) / 2.0)
-            prev = point
+    def __create_segments(self, freqs, levels):
+        points = numpy.column_stack((freqs, levels))
+        segments = numpy.stack((points[:-1], points[1:]), axis=1)
+        levels = (levels[:-1] + levels[1:]) / 2.0
 
         return segments, levels
 
@@ -628,23 +624,31 @@ class ThreadPlot(threading.Thread):
         text = '{}\n{}'.format(*format_precision(self.settings, x, y,
                                                  fancyUnits=True))
         if matplotlib.__version__ < '1.3':
-            self.axes.annotate(text,
-                               xy=(x, y), xytext=(textX, y),
-                               ha='left', va='top', size='x-small',
-                               gid='peak')
-            self.axes.plot(x, y, marker='x', markersize=10, color='w',
-                           mew=3, gid='peak')
-            self.axes.plot(x, y, marker='x', markersize=10, color='r',
-                           gid='peak')
+            markers = [self.axes.annotate(text,
+                                          xy=(x, y), xytext=(textX, y),
+                                          ha='left', va='top', size='x-small',
+                                          gid='peak')]
+            markers += self.axes.plot(x, y, marker='x', markersize=10,
+                                      color='w', mew=3, gid='peak')
+            markers += self.axes.plot(x, y, marker='x', markersize=10,
+                                      color='r', gid='peak')
         else:
             effect = patheffects.withStroke(linewidth=2, foreground="w",
                                             alpha=0.75)
-            self.axes.annotate(text,
-                               xy=(x, y), xytext=(textX, y),
-                               ha='left', va='top', size='x-small',
-                               path_effects=[effect], gid='peak')
-            self.axes.plot(x, y, marker='x', markersize=10, color='r',
-                           path_effects=[effect], gid='peak')
+            markers = [self.axes.annotate(text,
+                                          xy=(x, y), xytext=(textX, y),
+                                          ha='left', va='top', size='x-small',
+                                          path_effects=[effect], gid='peak')]
+            markers += self.axes.plot(x, y, marker='x', markersize=10,
+                                      color='r', path_effects=[effect],
+                                      gid='peak')
+
+        for marker in markers:
+            marker.set_animated(self.live)
+
+    def __get_limits(self):
+        return (self.axes.get_xlim(), self.axes.get_ylim(),
+                self.barBase.get_clim())
 
     def __get_plots(self):
         plots = []
@@ -40,7 +40,7 @@ import numpy
 from constants import Markers
 from events import EventThread, Event, post_event
 from misc import format_time, format_precision
-from spectrum import split_spectrum, Measure
+from spectrum import Measure, create_array
 from utils_mpl import utc_to_mpl
 
 
@@ -52,6 +52,7 @@ class Spectrogram(object):
         self.data = [[], [], []]
         self.axes = None
         self.plot = None
+        self.waterfall = None
         self.extent = None
         self.bar = None
         self.barBase = None
@@ -249,14 +250,15 @@ class Spectrogram(object):
     def set_title(self, title):
         self.axes.set_title(title, fontsize='medium')
 
-    def set_plot(self, spectrum, extent, annotate=False):
+    def set_plot(self, spectrum, extent, annotate=False, live=False):
         self.extent = extent
         self.threadPlot = ThreadPlot(self, self.settings,
                                      self.axes,
                                      spectrum,
                                      self.extent,
                                      self.barBase,
-                                     annotate)
+                                     annotate,
+                                     live)
         self.threadPlot.start()
 
     def clear_plots(self):
@@ -265,6 +267,8 @@ class Spectrogram(object):
             if child.get_gid() is not None:
                 if child.get_gid() == "plot_line" or child.get_gid() == "peak":
                     child.remove()
+        self.plot = None
+        self.waterfall = None
 
     def set_grid(self, on):
         if on:
@@ -289,7 +293,7 @@ class Spectrogram(object):
 
 class ThreadPlot(threading.Thread):
     def __init__(self, parent, settings, axes, data, extent,
-                 barBase, annotate):
+                 barBase, annotate, live):
         threading.Thread.__init__(self)
         self.name = "Plot"
         self.parent = parent
@@ -299,9 +303,11 @@ class ThreadPlot(threading.Thread):
         self.extent = extent
         self.retainMax = settings.retainMax
         self.colourMap = settings.colourMap
+        self.interpolation = settings.interpolation
         self.autoL = settings.autoL
         self.barBase = barBase
         self.annotate = annotate
+        self.live = live
 
     def run(self):
         if self.data is None:
@@ -310,18 +316,7 @@ class ThreadPlot(threading.Thread):
 
         total = len(self.data)
         if total > 0:
-            width = len(self.data[min(self.data)])
-            c = numpy.ma.masked_all((self.retainMax, width))
-            self.parent.clear_plots()
-            j = self.retainMax
-            for ys in self.data:
-                j -= 1
-                _xs, zs = split_spectrum(self.data[ys])
-                for i in range(len(zs)):
-                    try:
-                        c[j, i] = zs[i]
-                    except IndexError:
-                        continue
+            waterfall = self.__update_waterfall()
 
             norm = None
             if not self.autoL:
@@ -329,12 +324,27 @@ class ThreadPlot(threading.Thread):
                 norm = Normalize(vmin=minY, vmax=maxY)
 
             extent = self.extent.get_ft()
-            self.parent.plot = self.axes.imshow(c, aspect='auto',
-                                                extent=extent,
-                                                norm=norm,
-                                                cmap=cm.get_cmap(self.colourMap),
-                                                interpolation='spline16',
-                                                gid="plot_line")
+            plot = self.parent.plot
+            if plot is None:
+                self.parent.clear_plots()
+                plot = self.axes.imshow(waterfall.get_image(), aspect='auto',
+                                        extent=extent,
+                                        norm=norm,
+                                        cmap=cm.get_cmap(self.colourMap),
+                                        interpolation=self.interpolation,
+                                        gid="plot_line")
+                self.parent.plot = plot
+            else:
+                self.__clear_markers()
+                plot.set_data(waterfall.get_image())
+                plot.set_extent(extent)
+                plot.set_interpolation(self.interpolation)
+                if norm is None:
+                    plot.set_norm(Normalize())
+                    plot.autoscale()
+                else:
+                    plot.set_norm(norm)
+            self.parent.waterfall = waterfall
 
             if self.annotate:
                 self.__annotate_plot()
@@ -345,6 +355,22 @@ class ThreadPlot(threading.Thread):
 
         self.parent.threadPlot = None
 
+    def __update_waterfall(self):
+        freqs, levels = create_array(self.data)
+        times = numpy.array(self.data.keys(), numpy.float64)
+        order = numpy.argsort(times)[-self.retainMax:]
+        times = times[order]
+        levels = levels[order]
+
+        waterfall = self.parent.waterfall
+        if not self.live or waterfall is None or \
+           not waterfall.is_compatible(freqs, self.retainMax) or \
+           not waterfall.update(times, levels):
+            waterfall = Waterfall(freqs, self.retainMax)
+            waterfall.update(times, levels)
+
+        return waterfall
+
     def __annotate_plot(self):
         self.__clear_markers()
         fMax, lMax, tMax = self.extent.get_peak_flt()
@@ -384,6 +410,49 @@ class ThreadPlot(threading.Thread):
                     child.remove()
 
 
+class Waterfall(object):
+    def __init__(self, freqs, rows):
+        self.freqs = freqs
+        self.rows = rows
+        self.times = []
+        self.head = 0
+        self.buffer = numpy.empty((rows * 2, len(freqs)))
+        self.buffer.fill(numpy.nan)
+
+    def __write(self, row, levels):
+        self.buffer[row] = levels
+        self.buffer[row + self.rows] = levels
+
+    def __append(self, timeStamp, levels):
+        self.__write(self.head, levels)
+        self.head = (self.head + 1) % self.rows
+        self.times.append(timeStamp)
+        del self.times[:-self.rows]
+
+    def is_compatible(self, freqs, rows):
+        return self.rows == rows and numpy.array_equal(self.freqs, freqs)
+
+    def update(self, times, levels):
+        if len(self.times):
+            last = self.times[-1]
+            known = times[times <= last][-self.rows:].tolist()
+            if not len(known) or known != self.times[-len(known):]:
+                return False
+            index = numpy.searchsorted(times, last)
+            self.__write((self.head - 1) % self.rows, levels[index])
+            index += 1
+        else:
+            index = 0
+
+        for i in range(max(index, len(times) - self.rows), len(times)):
+            self.__append(float(times[i]), levels[i])
+
+        return True
+
+    def get_image(self):
+        return self.buffer[self.head:self.head + self.rows]
+
+
 if __name__ == '__main__':
     print 'Please run rtlsdr_scan.py'
     exit(1)
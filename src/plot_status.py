@@ -76,7 +76,7 @@ class PlotterStatus(object):
     def set_title(self, title):
         self.axes.set_title(title, fontsize='medium')
 
-    def set_plot(self, spectrum, extent, _annotate=False):
+    def set_plot(self, spectrum, extent, _annotate=False, _live=False):
         self.threadPlot = ThreadPlot(self, self.settings, self.axes,
                                      spectrum, extent)
         self.threadPlot.start()
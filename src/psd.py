@@ -0,0 +1,120 @@
+#
+# rtlsdr_scan
+#
+# http://eartoearoak.com/software/rtlsdr-scanner
+#
+# Copyright 2012 - 2014 Al Brown
+#
+# A frequency scanning GUI for the OsmoSDR rtl-sdr library at
+# http://sdr.osmocom.org/trac/wiki/rtl-sdr
+#
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import numpy
+from numpy.lib.stride_tricks import as_strided
+
+from constants import WINFUNC
+
+try:
+    import pyfftw.builders
+except ImportError:
+    pyfftw = None
+
+
+class Welch(object):
+    PLANS_MAX = 8
+
+    def __init__(self):
+        self.functions = dict(zip(WINFUNC[::2], WINFUNC[1::2]))
+        self.windows = {}
+        self.plans = {}
+
+    def __get_window(self, winFunc, nfft, dtype):
+        key = (winFunc, nfft, dtype)
+        window = self.windows.get(key)
+        if window is None:
+            window = self.functions[winFunc](nfft).astype(dtype)
+            self.windows[key] = window
+
+        return window
+
+    def __get_plan(self, segments, real):
+        key = (segments.shape, segments.dtype.str, real)
+        plan = self.plans.get(key)
+        if plan is None:
+            if len(self.plans) >= self.PLANS_MAX:
+                self.plans.clear()
+            if real:
+                plan = pyfftw.builders.rfft(segments, axis=1)
+            else:
+                plan = pyfftw.builders.fft(segments, axis=1)
+            self.plans[key] = plan
+
+        return plan
+
+    def __transform(self, segments, real):
+        if pyfftw is not None:
+            return self.__get_plan(segments, real)(segments)
+        if real:
+            return numpy.fft.rfft(segments, axis=1)
+        return numpy.fft.fft(segments, axis=1)
+
+    def psd(self, samples, nfft, noverlap, fs, winFunc):
+        samples = numpy.asarray(samples)
+        real = not numpy.iscomplexobj(samples)
+        if samples.dtype in (numpy.complex64, numpy.float32):
+            dtype = numpy.float32
+        else:
+            dtype = numpy.float64
+            if real:
+                samples = samples.astype(numpy.float64)
+
+        if len(samples) < nfft:
+            samples = numpy.concatenate((samples,
+                                         numpy.zeros(nfft - len(samples),
+                                                     samples.dtype)))
+        step = max(nfft - noverlap, 1)
+        count = (len(samples) - nfft) // step + 1
+        stride = samples.strides[0]
+        segments = as_strided(samples,
+                              shape=(count, nfft),
+                              strides=(stride * step, stride))
+
+        window = self.__get_window(winFunc, nfft, dtype)
+        segments = segments * window
+        spectrum = self.__transform(segments, real)
+
+        powers = spectrum.real ** 2
+        powers += spectrum.imag ** 2
+        powers = powers.sum(axis=0)
+        powers /= count * fs * numpy.dot(window, window)
+
+        if real:
+            if nfft % 2:
+                powers[1:] *= 2
+            else:
+                powers[1:-1] *= 2
+            freqs = numpy.arange(len(powers)) * float(fs) / nfft
+        else:
+            powers = numpy.fft.fftshift(powers)
+            freqs = numpy.fft.fftshift(numpy.fft.fftfreq(nfft, 1. / fs))
+
+        return powers, freqs
+
+
+if __name__ == '__main__':
+    print 'Please run rtlsdr_scan.py'
+    exit(1)
@@ -49,6 +49,7 @@ from cli import Cli
 from file import File
 from main_window import FrameMain, RtlSdrScanner
 from misc import set_version_timestamp
+from scan import SharedCapture
 
 
 def __init_worker():
@@ -106,6 +107,7 @@ def __arguments():
 if __name__ == '__main__':
     multiprocessing.freeze_support()
     pool = multiprocessing.Pool(initializer=__init_worker)
+    SharedCapture.remove_captures(True)
     print "RTLSDR Scanner\n"
     if 'rtlsdr_update_timestamp'in os.environ:
         set_version_timestamp()
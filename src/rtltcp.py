@@ -46,6 +46,7 @@ class RtlTcp(object):
         self.threadBuffer = None
         self.tuner = 0
         self.rate = 0
+        self.settle = None
 
         self.__setup()
 
@@ -73,14 +74,6 @@ class RtlTcp(object):
     def __read_raw(self, samples):
         return self.threadBuffer.recv(samples * 2)
 
-    def __raw_to_iq(self, raw):
-        iq = numpy.empty(len(raw) / 2, 'complex')
-        iq.real, iq.imag = raw[::2], raw[1::2]
-        iq /= (255 / 2)
-        iq -= 1
-
-        return iq
-
     def set_sample_rate(self, rate):
         self.__send_command(RtlTcpCmd.SET_SAMPLE_RATE, rate)
         self.rate = rate
@@ -93,15 +86,24 @@ class RtlTcp(object):
 
     def set_center_freq(self, freq):
         self.__send_command(RtlTcpCmd.SET_FREQ, freq)
-        self.__read_raw(int(self.rate * 2 * 0.1))
+        settle = self.settle
+        if settle is None:
+            settle = int(self.rate * 0.1)
+        self.threadBuffer.mark(settle * 2)
+
+    def set_settle(self, samples):
+        self.settle = samples
 
     def get_tuner_type(self):
         return self.tuner
 
+    def read_bytes(self, length):
+        return self.threadBuffer.recv(length)
+
     def read_samples(self, samples):
 
         raw = self.__read_raw(samples)
-        return self.__raw_to_iq(raw)
+        return bytes_to_iq(raw)
 
     def close(self):
         self.threadBuffer.abort()
@@ -110,16 +112,19 @@ class RtlTcp(object):
 
 class ThreadBuffer(threading.Thread):
     name = 'Buffer'
-    buffer = ""
     cancel = False
-    readLen = 0
-    read = 0
-    done = False
-    READ_SIZE = 4096
+    closed = False
+    READ_SIZE = 65536
+    RING_SIZE = 2 ** 22
 
     def __init__(self, host, port):
         threading.Thread.__init__(self)
 
+        self.ring = numpy.empty(self.RING_SIZE, numpy.uint8)
+        self.written = 0
+        self.readPos = 0
+        self.target = None
+
         self.condition = threading.Condition()
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.socket.settimeout(5)
@@ -130,60 +135,85 @@ class ThreadBuffer(threading.Thread):
 
     def run(self):
         while not self.cancel:
-            if self.readLen > 0:
-                self.__read_stream()
-            else:
-                self.__skip_stream()
+            ring = self.ring
+            pos = self.written % len(ring)
+            length = min(self.READ_SIZE, len(ring) - pos)
+            try:
+                recv = self.socket.recv_into(ring[pos:pos + length], length)
+            except socket.timeout:
+                continue
+            except socket.error:
+                break
+            if recv == 0:
+                break
+            self.written += recv
+            if self.target is not None and self.written >= self.target:
+                self.condition.acquire()
+                self.condition.notify()
+                self.condition.release()
 
         self.socket.close()
-        self.__do_notify()
-
-    def __do_wait(self):
         self.condition.acquire()
-        while not self.done:
-            self.condition.wait(2)
-        self.done = False
-        self.condition.release()
-
-    def __do_notify(self):
-        self.condition.acquire()
-        self.done = True
+        self.closed = True
         self.condition.notify()
         self.condition.release()
 
-    def __read_stream(self):
-        data = []
-        recv = ""
+    def __resize(self, length):
+        size = len(self.ring)
+        while size < length * 2:
+            size *= 2
+        self.ring = numpy.empty(size, numpy.uint8)
+        readPos = max(self.readPos, self.written + self.READ_SIZE)
+        self.readPos = readPos + (readPos & 1)
 
-        self.buffer = ""
-        while self.readLen > 0:
-            recv = self.socket.recv(self.readLen)
-            if len(recv) == 0:
-                break
-            data.append(recv)
-            self.readLen -= len(recv)
+    def __copy(self, start, length):
+        size = len(self.ring)
+        data = numpy.empty(length, numpy.uint8)
+        pos = start % size
+        first = min(length, size - pos)
+        data[:first] = self.ring[pos:pos + first]
+        data[first:] = self.ring[:length - first]
 
-        self.buffer = bytearray(''.join(data))
-        self.__do_notify()
-
-    def __skip_stream(self):
-        total = self.READ_SIZE
-        while total > 0:
-            recv = self.socket.recv(total)
-            if len(recv) == 0:
-                break
-            total -= len(recv)
+        return data
 
     def get_header(self):
         return self.header
 
+    def mark(self, skip=0):
+        self.condition.acquire()
+        readPos = self.written + skip
+        self.readPos = readPos + (readPos & 1)
+        self.condition.release()
+
     def recv(self, length):
-        self.readLen = length
-        self.__do_wait()
-        return self.buffer
+        self.condition.acquire()
+        if length * 2 > len(self.ring):
+            self.__resize(length)
+        oldest = self.written - len(self.ring) + self.READ_SIZE
+        start = max(self.readPos, oldest)
+        start += start & 1
+        self.target = start + length
+        while self.written < self.target and not self.closed:
+            self.condition.wait(2)
+        self.target = None
+        length = max(min(length, self.written - start), 0)
+        self.readPos = start + length
+        self.condition.release()
+
+        return self.__copy(start, length)
 
     def sendall(self, data):
         self.socket.sendall(data)
 
     def abort(self):
         self.cancel = True
+
+
+IQ_LUT = numpy.arange(256, dtype=numpy.float32) / 127 - 1
+
+
+def bytes_to_iq(raw):
+    raw = numpy.frombuffer(raw, numpy.uint8)
+    iq = IQ_LUT[raw[:len(raw) & ~1]]
+
+    return iq.view(numpy.complex64)
@@ -23,51 +23,70 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
-import itertools
+import Queue
+import errno
 import math
+import os
+import tempfile
 import threading
 import time
 
-import matplotlib
+import numpy
 import rtlsdr
 
-from constants import SAMPLE_RATE, BANDWIDTH, WINFUNC
+from constants import SAMPLE_RATE
 from events import EventThread, Event, post_event
+from planner import ScanPlan
+from psd import Welch
 import rtltcp
+from rtltcp import bytes_to_iq
+
+
+WELCH = Welch()
 
 
 class ThreadScan(threading.Thread):
-    def __init__(self, notify, sdr, settings, device, samples, isCal):
+    def __init__(self, notify, sdr, settings, device, samples, isCal,
+                 span=None, timeStamp=None):
         threading.Thread.__init__(self)
         self.name = 'Scan'
         self.notify = notify
         self.sdr = sdr
-        self.fstart = settings.start * 1e6
-        self.fstop = settings.stop * 1e6
+        if span is None:
+            span = (settings.start, settings.stop)
+        self.fstart = span[0] * 1e6
+        self.fstop = span[1] * 1e6
         self.samples = int(samples)
         self.isCal = isCal
-        self.indexRtl = settings.indexRtl
+        self.device = device
+        self.timeStamp = timeStamp
+        self.indexRtl = settings.devicesRtl[device].indexRtl
+        if self.indexRtl is None:
+            self.indexRtl = settings.indexRtl
         self.isDevice = settings.devicesRtl[device].isDevice
         self.server = settings.devicesRtl[device].server
         self.port = settings.devicesRtl[device].port
         self.gain = settings.devicesRtl[device].gain
         self.lo = settings.devicesRtl[device].lo * 1e6
+        self.pipeline = settings.pipeline
+        self.settle = settings.settle
         self.offset = settings.devicesRtl[device].offset
         self.cancel = False
 
-        post_event(self.notify, EventThread(Event.STARTING))
-        steps = int((self.__f_stop() - self.__f_start()) / self.__f_step())
-        post_event(self.notify, EventThread(Event.STEPS, steps))
-        self.start()
-
-    def __f_start(self):
-        return self.fstart - self.offset - BANDWIDTH
-
-    def __f_stop(self):
-        return self.fstop + self.offset + BANDWIDTH * 2
-
-    def __f_step(self):
-        return BANDWIDTH / 2
+        if self.isDevice:
+            settle = 0
+        else:
+            settle = self.settle
+        self.plan = ScanPlan(self.fstart, self.fstop, self.offset,
+                             self.samples, SAMPLE_RATE, settings.passband,
+                             settle, settings.nfft, settings.start * 1e6)
+
+        if self.timeStamp is None:
+            post_event(self.notify, EventThread(Event.STARTING))
+            steps = self.plan.get_steps() - 1
+            post_event(self.notify, EventThread(Event.STEPS, steps,
+                                                self.plan.get_sweep_time()))
+            self.start()
 
     def __rtl_setup(self):
 
@@ -100,30 +119,53 @@ class ThreadScan(threading.Thread):
         return tuner
 
     def run(self):
+        isWorker = self.timeStamp is not None
         tuner = self.__rtl_setup()
         if self.sdr is None:
             return
-        post_event(self.notify, EventThread(Event.INFO, None, tuner))
+        if not isWorker:
+            post_event(self.notify, EventThread(Event.INFO, None, tuner))
+        if not self.isDevice:
+            self.sdr.set_settle(self.settle)
 
-        freq = self.__f_start()
-        timeStamp = math.floor(time.time())
-        while freq <= self.__f_stop():
+        handoff = None
+        if self.pipeline:
+            handoff = ThreadHandoff(self.notify, self.device)
+
+        if isWorker:
+            timeStamp = self.timeStamp
+        else:
+            timeStamp = math.floor(time.time())
+        for freq in self.plan.get_freqs():
             if self.cancel:
-                post_event(self.notify,
-                           EventThread(Event.STOPPED))
+                if handoff is not None:
+                    handoff.stop()
+                if not isWorker:
+                    post_event(self.notify,
+                               EventThread(Event.STOPPED))
                 self.rtl_close()
                 return
             try:
-                scan = self.rtl_scan(freq)
-                if len(scan):
-                    post_event(self.notify,
-                               EventThread(Event.DATA, freq,
-                                           (timeStamp, scan)))
+                if handoff is None:
+                    scan = self.rtl_scan(freq)
+                    if len(scan):
+                        post_event(self.notify,
+                                   EventThread(Event.DATA, freq,
+                                               (timeStamp,
+                                                SharedCapture(scan),
+                                                self.device)))
+                else:
+                    raw = self.rtl_capture(freq)
+                    if len(raw):
+                        handoff.put(freq, timeStamp, raw)
             except IOError:
                 if self.sdr is not None:
                     self.rtl_close()
                 self.__rtl_setup()
             except (TypeError, AttributeError) as error:
+                if handoff is not None:
+                    handoff.stop()
+                self.rtl_close()
                 if self.notify:
                     post_event(self.notify,
                                EventThread(Event.ERROR,
@@ -133,8 +175,10 @@ class ThreadScan(threading.Thread):
                 if self.sdr is not None:
                     self.rtl_close()
 
-            freq += self.__f_step()
-
+        if handoff is not None:
+            handoff.stop()
+        if isWorker:
+            return
         post_event(self.notify, EventThread(Event.FINISHED, 0, None))
 
         if self.isCal:
@@ -154,34 +198,218 @@ class ThreadScan(threading.Thread):
 
         return capture
 
+    def rtl_capture(self, freq):
+        self.sdr.set_center_freq(freq + self.lo)
+        try:
+            raw = self.sdr.read_bytes(self.samples * 2)
+            capture = numpy.frombuffer(raw, numpy.uint8).copy()
+        except MemoryError as error:
+            post_event(self.notify, EventThread(Event.ERROR,
+                                                0, error))
+            capture = []
+
+        return capture
+
     def rtl_close(self):
-        self.sdr.close()
+        if self.sdr is not None:
+            self.sdr.close()
+            self.sdr = None
 
     def get_sdr(self):
         return self.sdr
 
+    def get_plan(self):
+        return self.plan
+
+
+class ThreadSweep(threading.Thread):
+    def __init__(self, notify, settings, devices, samples, sdrs):
+        threading.Thread.__init__(self)
+        self.name = 'Sweep'
+        self.notify = notify
+        self.sdrs = sdrs
+        self.cancel = False
+
+        timeStamp = math.floor(time.time())
+        width = float(settings.stop - settings.start) / len(devices)
+        self.workers = []
+        for i, device in enumerate(devices):
+            span = (settings.start + width * i,
+                    settings.start + width * (i + 1))
+            self.workers.append(ThreadScan(notify, sdrs.pop(device, None),
+                                           settings, device, samples, False,
+                                           span, timeStamp))
+
+        post_event(self.notify, EventThread(Event.STARTING))
+        plans = [worker.get_plan() for worker in self.workers]
+        steps = sum([plan.get_steps() for plan in plans]) - 1
+        sweepTime = max([plan.get_sweep_time() for plan in plans])
+        post_event(self.notify, EventThread(Event.STEPS, steps, sweepTime))
+        self.start()
+
+    def run(self):
+        for worker in self.workers:
+            worker.start()
+        for worker in self.workers:
+            worker.join()
+        for worker in self.workers:
+            sdr = worker.get_sdr()
+            if sdr is not None:
+                self.sdrs[worker.device] = sdr
+
+        if self.cancel:
+            post_event(self.notify, EventThread(Event.STOPPED))
+        else:
+            post_event(self.notify, EventThread(Event.FINISHED, 0, None))
+
+    def abort(self):
+        self.cancel = True
+        for worker in self.workers:
+            worker.abort()
+
+    def get_sdr(self):
+        return None
+
+
+class ThreadHandoff(threading.Thread):
+    def __init__(self, notify, device):
+        threading.Thread.__init__(self)
+        self.name = 'Handoff'
+        self.notify = notify
+        self.device = device
+        self.queue = Queue.Queue(2)
+        self.start()
+
+    def run(self):
+        while True:
+            block = self.queue.get()
+            if block is None:
+                break
+            freq, timeStamp, raw = block
+            capture = SharedCapture(bytes_to_iq(raw))
+            post_event(self.notify,
+                       EventThread(Event.DATA, freq,
+                                   (timeStamp, capture, self.device)))
+
+    def put(self, freq, timeStamp, raw):
+        self.queue.put((freq, timeStamp, raw))
+
+    def stop(self):
+        self.queue.put(None)
+        self.join()
+
+
+class SharedCapture(object):
+    DIR = '/dev/shm'
+    PREFIX = 'rtlsdr_scan_'
+    SUFFIX = '.iq'
+
+    def __init__(self, samples):
+        self.path = None
+        self.samples = samples
+        self.length = len(samples)
+        if not os.path.isdir(self.DIR):
+            return
+        try:
+            prefix = '{0}{1}_'.format(self.PREFIX, os.getpid())
+            handle, self.path = tempfile.mkstemp(prefix=prefix,
+                                                 suffix=self.SUFFIX,
+                                                 dir=self.DIR)
+            with os.fdopen(handle, 'wb') as capture:
+                numpy.asarray(samples, numpy.complex64).tofile(capture)
+            self.samples = None
+        except (IOError, OSError):
+            self.release()
+
+    def __len__(self):
+        return self.length
+
+    def read(self):
+        if self.path is None:
+            return self.samples
+        return numpy.memmap(self.path, numpy.complex64, 'r',
+                            shape=(self.length,))
+
+    def release(self):
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+    @staticmethod
+    def remove_captures(orphans=False):
+        if not os.path.isdir(SharedCapture.DIR):
+            return
+        for name in os.listdir(SharedCapture.DIR):
+            if not name.startswith(SharedCapture.PREFIX) or \
+               not name.endswith(SharedCapture.SUFFIX):
+                continue
+            pid = name[len(SharedCapture.PREFIX):].split('_')[0]
+            if pid == str(os.getpid()) or \
+               (orphans and not SharedCapture.__is_running(pid)):
+                try:
+                    os.remove(os.path.join(SharedCapture.DIR, name))
+                except OSError:
+                    pass
+
+    @staticmethod
+    def __is_running(pid):
+        try:
+            os.kill(int(pid), 0)
+        except ValueError:
+            return False
+        except OSError as error:
+            return error.errno == errno.EPERM
+
+        return True
+
 
 def anaylse_data(freq, data, cal, nfft, overlap, winFunc):
-    spectrum = {}
     timeStamp = data[0]
-    samples = data[1]
-    pos = WINFUNC[::2].index(winFunc)
-    function = WINFUNC[1::2][pos]
-    powers, freqs = matplotlib.mlab.psd(samples,
-                                        NFFT=nfft,
-                                        noverlap=int((nfft) * overlap),
-                                        Fs=SAMPLE_RATE / 1e6,
-                                        window=function(nfft))
-    for freqPsd, pwr in itertools.izip(freqs, powers):
-        xr = freqPsd + (freq / 1e6)
-        xr = xr + (xr * cal / 1e6)
-        spectrum[xr] = pwr
-
-    return (timeStamp, freq, spectrum)
+    capture = data[1]
+    device = data[2]
+    if isinstance(capture, SharedCapture):
+        try:
+            samples = capture.read()
+        except (IOError, OSError):
+            return None
+    else:
+        samples = capture
+    try:
+        powers, freqs = WELCH.psd(samples, nfft, int(nfft * overlap),
+                                  SAMPLE_RATE / 1e6, winFunc)
+    finally:
+        del samples
+        if isinstance(capture, SharedCapture):
+            capture.release()
+
+    scale = 1 + cal / 1e6
+    freqStart = (freqs[0] + freq / 1e6) * scale
+    freqStep = (freqs[1] - freqs[0]) * scale
+    powers = numpy.asarray(powers, numpy.float32).ravel()
+
+    return (timeStamp, freq, (freqStart, freqStep, powers), device)
 
 
 def update_spectrum(notify, lock, start, stop, freqCentre, data, offset,
-                    spectrum, average, alertLevel=None):
+                    width, spectrum, average, alertLevel=None):
+    freqStart, step, powers = data[1]
+    freqs = freqStart + numpy.arange(len(powers)) * step
+
+    upperStart = freqCentre + offset
+    upperEnd = freqCentre + offset + width
+    lowerStart = freqCentre - offset - width
+    lowerEnd = freqCentre - offset
+
+    freqsHz = freqs * 1e6
+    mask = (freqs >= start) & (freqs < stop)
+    mask &= ((freqsHz >= upperStart) & (freqsHz <= upperEnd)) | \
+        ((freqsHz >= lowerStart) & (freqsHz <= lowerEnd))
+    freqs = freqs[mask]
+    levels = 10 * numpy.log10(powers[mask])
+
     with lock:
         updated = False
         if average:
@@ -191,31 +419,18 @@ def update_spectrum(notify, lock, start, stop, freqCentre, data, offset,
                 timeStamp = data[0]
         else:
             timeStamp = data[0]
-        scan = data[1]
-
-        upperStart = freqCentre + offset
-        upperEnd = freqCentre + offset + BANDWIDTH / 2
-        lowerStart = freqCentre - offset - BANDWIDTH / 2
-        lowerEnd = freqCentre - offset
-
-        if timeStamp not in spectrum:
-            spectrum[timeStamp] = {}
-
-        for freq in scan:
-            if start <= freq < stop:
-                power = 10 * math.log10(scan[freq])
-                if upperStart <= freq * 1e6 <= upperEnd or \
-                   lowerStart <= freq * 1e6 <= lowerEnd:
-                    if freq in spectrum[timeStamp]:
-                        spectrum[timeStamp][freq] = \
-                            (spectrum[timeStamp][freq] + power) / 2
-                        if alertLevel is not None and (spectrum[timeStamp][freq] >
-                                                       alertLevel):
-                            post_event(notify, EventThread(Event.LEVEL))
-                        updated = True
-                    else:
-                        spectrum[timeStamp][freq] = power
-                        updated = True
+
+        if step > 0:
+            spectrum.set_axis(start, stop, step)
+
+        if len(freqs):
+            merged, overlap = spectrum.merge_sweep(timeStamp, freqs, levels)
+            updated = len(merged) > 0
+            if alertLevel is not None and \
+               numpy.any(merged[overlap] > alertLevel):
+                post_event(notify, EventThread(Event.LEVEL))
+        elif timeStamp not in spectrum:
+            spectrum.add_sweep(timeStamp)
 
     post_event(notify, EventThread(Event.UPDATED, None, updated))
 
@@ -25,7 +25,7 @@
 
 import wx
 
-from constants import Display, Mode, PlotFunc
+from constants import Display, Mode, PlotFunc, GeoInterp, GeoStat
 from devices import DeviceRTL, format_device_rtl_name, DeviceGPS
 
 
@@ -45,14 +45,22 @@ class Settings(object):
 
         self.retainScans = True
         self.retainMax = 20
+        self.recordScans = False
         self.fadeScans = True
         self.lineWidth = 0.4
         self.colourMapUse = True
         self.colourMap = 'jet'
         self.background = '#f0f0f0'
+        self.interpolation = 'spline16'
         self.wireframe = False
         self.pointsLimit = False
         self.pointsMax = 5000
+        self.polysMax = 10000
+        self.bandwidthDb = 3.0
+        self.obwPercent = 99.0
+        self.geoInterp = GeoInterp.LINEAR
+        self.geoResolution = 500
+        self.geoStat = GeoStat.PEAK
         self.grid = True
         self.plotFunc = PlotFunc.NONE
 
@@ -72,6 +80,9 @@ class Settings(object):
         self.nfft = 1024
         self.overlap = 0.0
         self.winFunc = "Hamming"
+        self.pipeline = True
+        self.settle = 200000
+        self.passband = 0.75
 
         self.startOption = 0
         self.stopOption = 0
@@ -128,6 +139,7 @@ class Settings(object):
             device.lo = self.cfg.ReadFloat('lo', 0)
             device.offset = self.cfg.ReadFloat('offset', 250e3)
             device.tuner = self.cfg.ReadInt('tuner', 0)
+            device.sweep = self.cfg.ReadBool('sweep', False)
             self.devicesRtl.append(device)
             self.cfg.SetPath("/DevicesRTL")
             group = self.cfg.GetNextGroup(group[2])
@@ -170,6 +182,7 @@ class Settings(object):
                 self.cfg.WriteFloat('calibration', device.calibration)
                 self.cfg.WriteFloat('offset', device.offset)
                 self.cfg.WriteInt('tuner', device.tuner)
+                self.cfg.WriteBool('sweep', device.sweep)
 
     def __save_devices_gps(self):
         self.cfg.DeleteGroup('/DevicesGPS')
@@ -198,12 +211,20 @@ class Settings(object):
         self.fadeScans = self.cfg.ReadBool('fadeScans', self.fadeScans)
         self.lineWidth = self.cfg.ReadFloat('lineWidth', self.lineWidth)
         self.retainMax = self.cfg.ReadInt('retainMax', self.retainMax)
+        self.recordScans = self.cfg.ReadBool('recordScans', self.recordScans)
         self.colourMapUse = self.cfg.ReadBool('colourMapUse', self.colourMapUse)
         self.colourMap = self.cfg.Read('colourMap', self.colourMap)
         self.background = self.cfg.Read('background', self.background)
+        self.interpolation = self.cfg.Read('interpolation', self.interpolation)
         self.wireframe = self.cfg.ReadBool('wireframe', self.wireframe)
         self.pointsLimit = self.cfg.ReadBool('pointsLimit', self.pointsLimit)
         self.pointsMax = self.cfg.ReadInt('pointsMax', self.pointsMax)
+        self.polysMax = self.cfg.ReadInt('polysMax', self.polysMax)
+        self.bandwidthDb = self.cfg.ReadFloat('bandwidthDb', self.bandwidthDb)
+        self.obwPercent = self.cfg.ReadFloat('obwPercent', self.obwPercent)
+        self.geoInterp = self.cfg.ReadInt('geoInterp', self.geoInterp)
+        self.geoResolution = self.cfg.ReadInt('geoResolution', self.geoResolution)
+        self.geoStat = self.cfg.ReadInt('geoStat', self.geoStat)
         self.grid = self.cfg.ReadBool('grid', self.grid)
         self.plotFunc = self.cfg.ReadInt('plotFunc', self.plotFunc)
         self.clickTune = self.cfg.ReadBool('clickTune', self.clickTune)
@@ -219,6 +240,9 @@ class Settings(object):
         self.nfft = self.cfg.ReadInt('nfft', self.nfft)
         self.overlap = self.cfg.ReadFloat('overlap', self.overlap)
         self.winFunc = self.cfg.Read('winFunc', self.winFunc)
+        self.pipeline = self.cfg.ReadBool('pipeline', self.pipeline)
+        self.settle = self.cfg.ReadInt('settle', self.settle)
+        self.passband = self.cfg.ReadFloat('passband', self.passband)
         self.startOption = self.cfg.ReadInt('startOption', self.startOption)
         self.stopOption = self.cfg.ReadInt('stopOption', self.stopOption)
         self.liveUpdate = self.cfg.ReadBool('liveUpdate', self.liveUpdate)
@@ -251,12 +275,20 @@ class Settings(object):
         self.cfg.WriteBool('fadeScans', self.fadeScans)
         self.cfg.WriteFloat('lineWidth', self.lineWidth)
         self.cfg.WriteInt('retainMax', self.retainMax)
+        self.cfg.WriteBool('recordScans', self.recordScans)
         self.cfg.WriteBool('colourMapUse', self.colourMapUse)
         self.cfg.Write('colourMap', self.colourMap)
         self.cfg.Write('background', self.background)
+        self.cfg.Write('interpolation', self.interpolation)
         self.cfg.WriteBool('wireframe', self.wireframe)
         self.cfg.WriteBool('pointsLimit', self.pointsLimit)
         self.cfg.WriteInt('pointsMax', self.pointsMax)
+        self.cfg.WriteInt('polysMax', self.polysMax)
+        self.cfg.WriteFloat('bandwidthDb', self.bandwidthDb)
+        self.cfg.WriteFloat('obwPercent', self.obwPercent)
+        self.cfg.WriteInt('geoInterp', self.geoInterp)
+        self.cfg.WriteInt('geoResolution', self.geoResolution)
+        self.cfg.WriteInt('geoStat', self.geoStat)
         self.cfg.WriteBool('grid', self.grid)
         self.cfg.WriteInt('plotFunc', self.plotFunc)
         self.cfg.WriteBool('clickTune', self.clickTune)
@@ -272,6 +304,9 @@ class Settings(object):
         self.cfg.WriteInt('nfft', self.nfft)
         self.cfg.WriteFloat('overlap', self.overlap)
         self.cfg.Write("winFunc", self.winFunc)
+        self.cfg.WriteBool('pipeline', self.pipeline)
+        self.cfg.WriteInt('settle', self.settle)
+        self.cfg.WriteFloat('passband', self.passband)
         self.cfg.WriteInt('startOption', self.startOption)
         self.cfg.WriteInt('stopOption', self.stopOption)
         self.cfg.WriteBool('liveUpdate', self.liveUpdate)
@@ -23,16 +23,479 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 from collections import OrderedDict
-from decimal import Decimal
-from operator import itemgetter, mul
+import itertools
+import math
+from operator import itemgetter
 
 from matplotlib.dates import seconds
 import numpy
 
+from constants import GeoStat
 from misc import db_to_level, level_to_db
 from utils_mpl import utc_to_mpl
 
 
+VERSION = itertools.count(1)
+
+
+class Sweep(object):
+    def __init__(self, freqs, levels, step, dirty=None, versions=None,
+                 row=None):
+        self.freqs = freqs
+        self.levels = levels
+        self.step = step
+        self.dirty = dirty
+        self.versions = versions
+        self.row = row
+
+    def __set_dirty(self):
+        if self.dirty is not None:
+            self.dirty[self.row] = True
+            self.versions[self.row] = next(VERSION)
+
+    def __valid(self):
+        return ~numpy.isnan(self.levels)
+
+    def __index(self, freq):
+        if len(self.freqs) == 0:
+            raise KeyError(freq)
+        index = int(round((freq - self.freqs[0]) / self.step))
+        if not 0 <= index < len(self.freqs):
+            raise KeyError(freq)
+        return index
+
+    def __len__(self):
+        return int(numpy.count_nonzero(self.__valid()))
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __contains__(self, freq):
+        try:
+            return not numpy.isnan(self.levels[self.__index(freq)])
+        except KeyError:
+            return False
+
+    def __getitem__(self, freq):
+        level = self.levels[self.__index(freq)]
+        if numpy.isnan(level):
+            raise KeyError(freq)
+        return float(level)
+
+    def __setitem__(self, freq, level):
+        self.levels[self.__index(freq)] = level
+        self.__set_dirty()
+
+    def __delitem__(self, freq):
+        self.levels[self.__index(freq)] = numpy.nan
+        self.__set_dirty()
+
+    def get(self, freq, default=None):
+        try:
+            return self[freq]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return self.freqs[self.__valid()].tolist()
+
+    def values(self):
+        return self.levels[self.__valid()].tolist()
+
+    def items(self):
+        freqs, levels = self.get_arrays()
+        return zip(freqs.tolist(), levels.tolist())
+
+    def iterkeys(self):
+        return iter(self.keys())
+
+    def itervalues(self):
+        return iter(self.values())
+
+    def iteritems(self):
+        return iter(self.items())
+
+    def copy(self):
+        return dict(self.items())
+
+    def get_arrays(self):
+        valid = self.__valid()
+        return self.freqs[valid], self.levels[valid]
+
+    def get_range(self, start, end):
+        lower = numpy.searchsorted(self.freqs, start, 'left')
+        upper = numpy.searchsorted(self.freqs, end, 'right')
+        return self.freqs[lower:upper], self.levels[lower:upper]
+
+    def has_range(self, start, end):
+        _freqs, levels = self.get_range(start, end)
+        return (len(levels) > 0 and
+                not numpy.isnan(levels[0]) and not numpy.isnan(levels[-1]))
+
+
+class SpectrumStore(object):
+    BINS_MAX = 2 ** 24
+    STAT_MIN, STAT_MAX, STAT_FIRST, STAT_LAST, STAT_PEAK = range(5)
+
+    def __init__(self, capacity=4):
+        self.descending = False
+        self.__start = None
+        self.__step = None
+        self.__freqs = numpy.empty(0)
+        self.__capacity = max(1, capacity)
+        self.__levels = numpy.empty((self.__capacity, 0), numpy.float32)
+        self.__times = numpy.zeros(self.__capacity)
+        self.__locations = numpy.empty((self.__capacity, 3))
+        self.__stats = numpy.empty((self.__capacity, 5))
+        self.__dirty = numpy.ones(self.__capacity, numpy.bool_)
+        self.__versions = numpy.zeros(self.__capacity, numpy.int64)
+        self.__head = 0
+        self.__count = 0
+        self.__rows = {}
+
+    def __len__(self):
+        return self.__count
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __contains__(self, timeStamp):
+        return timeStamp in self.__rows
+
+    def __getitem__(self, timeStamp):
+        row = self.__rows[timeStamp]
+        return Sweep(self.__freqs, self.__levels[row], self.__step,
+                     self.__dirty, self.__versions, row)
+
+    def __setitem__(self, timeStamp, sweep):
+        if self.__start is None and len(sweep):
+            self.__set_axis_from(sweep.keys())
+        row = self.add_sweep(timeStamp)
+        self.__levels[row].fill(numpy.nan)
+        if len(sweep):
+            freqs = numpy.array(sweep.keys(), dtype=numpy.float64)
+            levels = numpy.array(sweep.values(), dtype=numpy.float32)
+            indices, valid = self.get_indices(freqs)
+            self.__levels[row, indices[valid]] = levels[valid]
+        self.__dirty[row] = True
+        self.__versions[row] = next(VERSION)
+
+    def __delitem__(self, timeStamp):
+        row = self.__rows[timeStamp]
+        if row == self.__head:
+            del self.__rows[timeStamp]
+            self.__head = (self.__head + 1) % self.__capacity
+            self.__count -= 1
+        else:
+            order = [r for r in self.__order(False) if r != row]
+            self.__rearrange(order, self.__capacity)
+
+    def __order(self, descending=None):
+        if descending is None:
+            descending = self.descending
+        order = (self.__head + numpy.arange(self.__count)) % self.__capacity
+        if descending:
+            return order[::-1]
+        return order
+
+    def __rearrange(self, order, capacity):
+        levels = numpy.empty((capacity, len(self.__freqs)), numpy.float32)
+        times = numpy.zeros(capacity)
+        locations = numpy.empty((capacity, 3))
+        stats = numpy.empty((capacity, 5))
+        dirty = numpy.ones(capacity, numpy.bool_)
+        versions = numpy.zeros(capacity, numpy.int64)
+        count = len(order)
+        levels[:count] = self.__levels[order]
+        times[:count] = self.__times[order]
+        locations[:count] = self.__locations[order]
+        stats[:count] = self.__stats[order]
+        dirty[:count] = self.__dirty[order]
+        versions[:count] = self.__versions[order]
+
+        self.__levels = levels
+        self.__times = times
+        self.__locations = locations
+        self.__stats = stats
+        self.__dirty = dirty
+        self.__versions = versions
+        self.__capacity = capacity
+        self.__head = 0
+        self.__count = count
+        self.__rows = dict((timeStamp, row) for row, timeStamp
+                           in enumerate(times[:count].tolist()))
+
+    def __set_axis_from(self, freqs):
+        freqs = numpy.unique(numpy.array(freqs, dtype=numpy.float64))
+        if len(freqs) > 1:
+            step = numpy.median(numpy.diff(freqs))
+            span = freqs[-1] - freqs[0]
+            step = max(step, span / self.BINS_MAX)
+        else:
+            step = 1.
+        self.set_axis(freqs[0], freqs[-1] + step / 2., step)
+
+    def set_axis(self, start, stop, step):
+        bins = max(int(math.ceil(round((stop - start) / step, 6))), 0)
+        self.__set_grid(start, step, bins)
+
+    def __set_grid(self, start, step, bins):
+        if self.__start is not None and \
+           len(self.__freqs) == bins and \
+           abs(start - self.__start) < step * 1e-3 and \
+           abs(step - self.__step) < step * 1e-3:
+            return
+
+        freqs = start + numpy.arange(bins) * step
+        levels = numpy.empty((self.__capacity, bins), numpy.float32)
+        levels.fill(numpy.nan)
+        if self.__count and len(self.__freqs):
+            indices, valid = self.get_indices(freqs)
+            levels[:, valid] = self.__levels[:, indices[valid]]
+
+        self.__start = start
+        self.__step = step
+        self.__freqs = freqs
+        self.__levels = levels
+        self.__dirty.fill(True)
+        self.__versions[:] = list(itertools.islice(VERSION,
+                                                   self.__capacity))
+
+    def has_axis(self):
+        return self.__start is not None
+
+    def get_indices(self, freqs):
+        bins = len(self.__freqs)
+        if bins == 0:
+            indices = numpy.zeros(len(freqs), dtype=numpy.int64)
+            return indices, indices != 0
+        indices = numpy.rint((freqs - self.__start) / self.__step)
+        indices = indices.astype(numpy.int64)
+        valid = (indices >= 0) & (indices < bins)
+        return indices, valid
+
+    def add_sweep(self, timeStamp):
+        if timeStamp in self.__rows:
+            return self.__rows[timeStamp]
+
+        if self.__count == self.__capacity:
+            self.__rearrange(self.__order(False), self.__capacity * 2)
+
+        latest = None
+        if self.__count:
+            latest = self.__times[self.__order(False)[-1]]
+
+        row = (self.__head + self.__count) % self.__capacity
+        self.__count += 1
+        self.__times[row] = timeStamp
+        self.__levels[row].fill(numpy.nan)
+        self.__locations[row].fill(numpy.nan)
+        self.__clear_stats(row)
+        self.__versions[row] = next(VERSION)
+        self.__rows[timeStamp] = row
+
+        if latest is not None and timeStamp < latest:
+            order = self.__order(False)
+            order = order[numpy.argsort(self.__times[order], kind='mergesort')]
+            self.__rearrange(order, self.__capacity)
+
+        return self.__rows[timeStamp]
+
+    def merge_sweep(self, timeStamp, freqs, levels):
+        row = self.add_sweep(timeStamp)
+        indices, valid = self.get_indices(freqs)
+        indices = indices[valid]
+        levels = levels[valid]
+        current = self.__levels[row, indices]
+        overlap = ~numpy.isnan(current)
+        levels = numpy.where(overlap, (current + levels) / 2.,
+                             levels).astype(numpy.float32)
+        self.__levels[row, indices] = levels
+        self.__merge_stats(row, indices, levels, current[overlap])
+        self.__versions[row] = next(VERSION)
+
+        return levels, overlap
+
+    def __clear_stats(self, row):
+        self.__stats[row] = [numpy.inf, -numpy.inf, -1, -1, -1]
+        self.__dirty[row] = False
+
+    def __merge_stats(self, row, indices, levels, replaced):
+        if self.__dirty[row] or not len(levels):
+            return
+        stats = self.__stats[row]
+        replaced = replaced.astype(stats.dtype)
+        levels = levels.astype(stats.dtype)
+        if len(replaced) and (replaced.min() <= stats[self.STAT_MIN] or
+                              replaced.max() >= stats[self.STAT_MAX]):
+            self.__dirty[row] = True
+            return
+
+        stats[self.STAT_MIN] = min(stats[self.STAT_MIN], levels.min())
+        peak = levels.argmax()
+        if levels[peak] > stats[self.STAT_MAX]:
+            stats[self.STAT_MAX] = levels[peak]
+            stats[self.STAT_PEAK] = indices[peak]
+        first = indices.min()
+        if stats[self.STAT_FIRST] < 0 or first < stats[self.STAT_FIRST]:
+            stats[self.STAT_FIRST] = first
+        stats[self.STAT_LAST] = max(stats[self.STAT_LAST], indices.max())
+
+    def __update_stats(self, rows):
+        rows = rows[self.__dirty[rows]]
+        if not len(rows):
+            return
+        levels = self.__levels[rows]
+        valid = ~numpy.isnan(levels)
+        bins = levels.shape[1]
+        stats = numpy.empty((len(rows), 5))
+        stats[:, self.STAT_MIN] = numpy.where(valid, levels,
+                                              numpy.inf).min(axis=1)
+        maxima = numpy.where(valid, levels, -numpy.inf)
+        stats[:, self.STAT_PEAK] = maxima.argmax(axis=1)
+        stats[:, self.STAT_MAX] = maxima.max(axis=1)
+        stats[:, self.STAT_FIRST] = valid.argmax(axis=1)
+        stats[:, self.STAT_LAST] = bins - 1 - valid[:, ::-1].argmax(axis=1)
+        empty = ~valid.any(axis=1)
+        stats[empty, self.STAT_FIRST:] = -1
+        self.__stats[rows] = stats
+        self.__dirty[rows] = False
+
+    def get_extent(self):
+        order = self.__order(False)
+        if not len(order):
+            return None
+        self.__update_stats(order)
+        stats = self.__stats[order]
+        times = self.__times[order]
+        extent = {'tMin': float(times.min()),
+                  'tMax': float(times.max())}
+
+        filled = stats[:, self.STAT_FIRST] >= 0
+        if filled.any():
+            stats = stats[filled]
+            first = int(stats[:, self.STAT_FIRST].min())
+            last = int(stats[:, self.STAT_LAST].max())
+            extent['fMin'] = float(self.__freqs[first])
+            extent['fMax'] = float(self.__freqs[last])
+            extent['lMin'] = float(stats[:, self.STAT_MIN].min())
+            extent['lMax'] = float(stats[:, self.STAT_MAX].max())
+
+        row = self.__rows[extent['tMax']]
+        peak = int(self.__stats[row, self.STAT_PEAK])
+        if peak >= 0:
+            extent['fPeak'] = float(self.__freqs[peak])
+            extent['lPeak'] = float(self.__levels[row, peak])
+
+        return extent
+
+    def get_row(self, timeStamp):
+        return self.__levels[self.__rows[timeStamp]]
+
+    def get_freqs(self):
+        return self.__freqs
+
+    def get_step(self):
+        return self.__step
+
+    def get_times(self):
+        return self.__times[self.__order()]
+
+    def get_levels(self):
+        return self.__levels[self.__order()]
+
+    def get_range(self, start, end):
+        lower = numpy.searchsorted(self.__freqs, start, 'left')
+        upper = numpy.searchsorted(self.__freqs, end, 'right')
+        return (self.__freqs[lower:upper],
+                self.__levels[self.__order(), lower:upper])
+
+    def set_sweep(self, timeStamp, levels):
+        row = self.add_sweep(timeStamp)
+        self.__levels[row] = levels
+        self.__dirty[row] = True
+        self.__versions[row] = next(VERSION)
+
+    def set_levels(self, levels):
+        order = self.__order()
+        self.__levels[order] = levels
+        self.__dirty[order] = True
+        self.__versions[order] = next(VERSION)
+
+    def get_versions(self):
+        return self.__versions[self.__order()]
+
+    def set_location(self, timeStamp, location):
+        if timeStamp in self.__rows:
+            location = [numpy.nan if value is None else value
+                        for value in location[:3]]
+            self.__locations[self.__rows[timeStamp]] = location
+
+    def keys(self):
+        return self.get_times().tolist()
+
+    def values(self):
+        return [self[timeStamp] for timeStamp in self.keys()]
+
+    def items(self):
+        return [(timeStamp, self[timeStamp]) for timeStamp in self.keys()]
+
+    def iterkeys(self):
+        return iter(self.keys())
+
+    def itervalues(self):
+        return iter(self.values())
+
+    def iteritems(self):
+        return iter(self.items())
+
+    def update(self, spectrum):
+        if not self.has_axis():
+            freqs = set()
+            for sweep in spectrum.itervalues():
+                freqs.update(sweep.iterkeys())
+            if len(freqs):
+                self.__set_axis_from(list(freqs))
+        for timeStamp in sorted(spectrum):
+            self[timeStamp] = spectrum[timeStamp]
+
+    def clear(self):
+        self.__head = 0
+        self.__count = 0
+        self.__rows = {}
+
+    def copy(self, descending=None, start=None, end=None):
+        if descending is None:
+            descending = self.descending
+        order = self.__order(False)
+        times = self.__times[order]
+        mask = numpy.ones(len(order), numpy.bool_)
+        if start is not None:
+            mask &= times >= start
+        if end is not None:
+            mask &= times <= end
+        order = order[mask]
+        store = SpectrumStore(len(order))
+        store.descending = descending
+        if self.has_axis():
+            store.__set_grid(self.__start, self.__step, len(self.__freqs))
+        count = len(order)
+        store.__levels[:count] = self.__levels[order]
+        store.__times[:count] = self.__times[order]
+        store.__locations[:count] = self.__locations[order]
+        store.__stats[:count] = self.__stats[order]
+        store.__dirty[:count] = self.__dirty[order]
+        store.__versions[:count] = self.__versions[order]
+        store.__count = count
+        store.__rows = dict((timeStamp, row) for row, timeStamp
+                            in enumerate(store.__times[:count].tolist()))
+
+        return store
+
+    def __copy__(self):
+        return self.copy()
+
+
 class Extent(object):
     def __init__(self, spectrum):
         self.__clear()
@@ -50,6 +513,10 @@ class Extent(object):
         self.tPeak = None
 
     def __calc_extent(self, spectrum):
+        if isinstance(spectrum, SpectrumStore):
+            self.__calc_extent_store(spectrum)
+            return
+
         for timeStamp in spectrum:
             points = spectrum[timeStamp].items()
             if len(points) > 0:
@@ -68,6 +535,14 @@ class Extent(object):
             self.fPeak, self.lPeak = max(spectrum[self.tMax].items(),
                                          key=lambda(_f, l): l)
 
+    def __calc_extent_store(self, spectrum):
+        extent = spectrum.get_extent()
+        if extent is None:
+            return
+        for key, value in extent.iteritems():
+            setattr(self, key, value)
+        self.tPeak = self.tMax
+
     def get_f(self):
         if self.fMin == self.fMax:
             return self.fMin, self.fMax - 0.001
@@ -92,10 +567,73 @@ class Extent(object):
         return self.fPeak, self.lPeak, self.tPeak
 
 
+class BandLevels(object):
+    def __init__(self, spectrum, locations):
+        self.spectrum = spectrum
+        if isinstance(spectrum, SpectrumStore):
+            self.freqs = spectrum.get_freqs()
+            self.levels = None
+            times = spectrum.get_times().tolist()
+        else:
+            self.freqs, self.levels = create_array(spectrum)
+            times = spectrum.keys()
+        if len(self.freqs) > 1:
+            self.step = float(numpy.min(numpy.diff(self.freqs)))
+        else:
+            self.step = 0
+
+        rows = []
+        coords = []
+        for row, timeStamp in enumerate(times):
+            location = locations.get(timeStamp)
+            if location is not None:
+                rows.append(row)
+                coords.append((list(location[:3]) + [None] * 3)[:3])
+        self.rows = numpy.array(rows, numpy.intp)
+        self.coords = numpy.array(coords, numpy.float64).reshape(-1, 3)
+
+    def __get_band(self, start, end):
+        if self.levels is None:
+            _freqs, levels = self.spectrum.get_range(start, end)
+        else:
+            lower = numpy.searchsorted(self.freqs, start, 'left')
+            upper = numpy.searchsorted(self.freqs, end, 'right')
+            levels = self.levels[:, lower:upper]
+
+        return numpy.asarray(levels[self.rows], numpy.float64)
+
+    def get_stat(self, start, end, stat=GeoStat.PEAK):
+        levels = self.__get_band(start, end)
+        valid = ~numpy.isnan(levels)
+        located = valid.any(axis=1)
+        coords = self.coords[located]
+        levels = levels[located]
+        valid = valid[located]
+        if not len(levels):
+            return coords, numpy.empty(0)
+
+        if stat == GeoStat.PEAK:
+            values = numpy.where(valid, levels, -numpy.inf).max(axis=1)
+        else:
+            powers = numpy.where(valid, numpy.power(10, levels / 10.), 0)
+            total = powers.sum(axis=1)
+            if stat == GeoStat.MEAN:
+                total /= valid.sum(axis=1)
+            elif self.step:
+                total *= self.step * 1e6
+            values = 10 * numpy.log10(total)
+
+        return coords, values
+
+
 class Measure(object):
     MIN, MAX, AVG, GMEAN, HBW, OBW = range(6)
+    CACHE_SIZE = 32
 
-    def __init__(self, spectrum, start, end):
+    cache = OrderedDict()
+
+    def __init__(self, spectrum, start, end, bandwidthDb=3.0,
+                 obwPercent=99.0):
         self.isValid = False
         self.minF = None
         self.maxF = None
@@ -107,67 +645,90 @@ class Measure(object):
         self.hbw = None
         self.obw = None
 
-        self.__calculate(spectrum, start, end)
+        self.__calculate(spectrum, start, end, bandwidthDb, obwPercent)
 
-    def __calculate(self, spectrum, start, end):
-        sweep = slice_spectrum(spectrum, start, end)
-        if sweep is None or len(sweep) == 0:
-            return
+    def __get_sweep(self, spectrum, start, end):
+        if spectrum is None or start is None or end is None or len(spectrum) < 1:
+            return None
+
+        timeStamps = sorted(spectrum)
+        sweep = spectrum[timeStamps[-1]]
+        if len(sweep) == 0:
+            return None
 
-        self.minF = min(sweep)[0]
-        self.maxF = max(sweep)[0]
-        self.minP = min(sweep, key=lambda v: v[1])
-        self.maxP = max(sweep, key=lambda v: v[1])
+        if not self.__has_range(sweep, start, end):
+            if len(timeStamps) > 1:
+                sweep = spectrum[timeStamps[-2]]
+            else:
+                return None
 
-        powers = [Decimal(db_to_level(p[1])) for p in sweep]
-        length = len(powers)
+        return sweep
 
-        avg = sum(powers, Decimal(0)) / length
-        self.avgP = level_to_db(avg)
+    def __has_range(self, sweep, start, end):
+        if isinstance(sweep, Sweep):
+            return sweep.has_range(start, end)
+
+        return min(sweep) <= start and max(sweep) >= end
+
+    def __calculate(self, spectrum, start, end, bandwidthDb, obwPercent):
+        sweep = self.__get_sweep(spectrum, start, end)
+        if sweep is None:
+            return
+
+        key = None
+        if isinstance(sweep, Sweep) and sweep.versions is not None:
+            key = (sweep.versions[sweep.row], start, end, bandwidthDb,
+                   obwPercent)
+            if key in Measure.cache:
+                self.__dict__.update(Measure.cache[key])
+                return
+
+        freqs, levels = range_spectrum_array(sweep, start, end)
+        levels = numpy.asarray(levels, numpy.float64)
+        if len(freqs) == 0:
+            return
 
-        product = reduce(mul, iter(powers))
-        gMean = product ** (Decimal(1.0) / length)
-        self.gMeanP = level_to_db(gMean)
+        self.minF = float(freqs[0])
+        self.maxF = float(freqs[-1])
+        iMin = numpy.argmin(levels)
+        iMax = numpy.argmax(levels)
+        self.minP = (float(freqs[iMin]), float(levels[iMin]))
+        self.maxP = (float(freqs[iMax]), float(levels[iMax]))
 
-        self.flatness = gMean / avg
+        powers = numpy.power(10, levels / 10.)
+        avg = numpy.mean(powers)
+        self.avgP = level_to_db(avg)
+        self.gMeanP = float(numpy.mean(levels))
+        self.flatness = db_to_level(self.gMeanP) / avg
 
-        self.__calc_hbw(sweep)
-        self.__calc_obw(sweep)
+        self.hbw = self.__calc_hbw(freqs, levels, self.maxP[1] - bandwidthDb)
+        self.obw = self.__calc_obw(freqs, levels, powers, obwPercent)
 
         self.isValid = True
 
-    def __calc_hbw(self, sweep):
-        power = self.maxP[1] - 3
-        self.hbw = [None, None, power]
+        if key is not None:
+            Measure.cache[key] = self.__dict__.copy()
+            while len(Measure.cache) > Measure.CACHE_SIZE:
+                Measure.cache.popitem(False)
 
-        if power >= self.minP[1]:
-            for (f, p) in sweep:
-                if p >= power:
-                    self.hbw[0] = f
-                    break
-            for (f, p) in reversed(sweep):
-                if p >= power:
-                    self.hbw[1] = f
-                    break
-
-    def __calc_obw(self, sweep):
-        self.obw = [None, None, None]
-
-        totalP = 0
-        for (_f, p) in sweep:
-            totalP += p
-        power = totalP * 0.005
-        self.obw[2] = power
+    def __calc_hbw(self, freqs, levels, power):
+        hbw = [None, None, power]
 
         if power >= self.minP[1]:
-            for (f, p) in sweep:
-                if p >= power:
-                    self.obw[0] = f
-                    break
-            for (f, p) in reversed(sweep):
-                if p >= power:
-                    self.obw[1] = f
-                    break
+            above = numpy.flatnonzero(levels >= power)
+            hbw[0] = float(freqs[above[0]])
+            hbw[1] = float(freqs[above[-1]])
+
+        return hbw
+
+    def __calc_obw(self, freqs, levels, powers, percent):
+        total = numpy.cumsum(powers)
+        outside = total[-1] * (100 - percent) / 200.
+        lower, upper = numpy.searchsorted(total, [outside, total[-1] - outside])
+        upper = min(upper, len(freqs) - 1)
+
+        return [float(freqs[lower]), float(freqs[upper]),
+                float(min(levels[lower], levels[upper]))]
 
     def is_valid(self):
         return self.isValid
@@ -198,6 +759,9 @@ class Measure(object):
 
 
 def count_points(spectrum):
+    if isinstance(spectrum, SpectrumStore):
+        return int(numpy.count_nonzero(~numpy.isnan(spectrum.get_levels())))
+
     points = 0
     for timeStamp in spectrum:
         points += len(spectrum[timeStamp])
@@ -205,29 +769,64 @@ def count_points(spectrum):
     return points
 
 
-def reduce_points(spectrum, limit):
+def reduce_points(spectrum, limit, xLim=None, pixels=None):
     total = count_points(spectrum)
     if total < limit:
         return spectrum
 
+    freqs, levels = create_array(spectrum)
+    if len(levels) == 0 or len(freqs) < 2:
+        return spectrum
+
+    columns = max(1, limit / (2 * len(levels)))
+    if pixels is not None:
+        columns = max(1, min(columns, int(pixels)))
+    groups = calc_columns(freqs, xLim, columns)
+    starts = numpy.concatenate(([0], numpy.flatnonzero(numpy.diff(groups)) + 1))
+    counts = numpy.diff(numpy.append(starts, len(freqs)))
+
+    valid = ~numpy.isnan(levels)
+    lower = numpy.where(valid, levels, numpy.inf)
+    upper = numpy.where(valid, levels, -numpy.inf)
+    mins = numpy.minimum.reduceat(lower, starts, axis=1)
+    maxs = numpy.maximum.reduceat(upper, starts, axis=1)
+    keep = valid & ((lower == numpy.repeat(mins, counts, axis=1)) |
+                    (upper == numpy.repeat(maxs, counts, axis=1)))
+
+    if isinstance(spectrum, SpectrumStore):
+        newSpectrum = spectrum.copy()
+        newSpectrum.set_levels(numpy.where(keep, levels, numpy.nan))
+        return newSpectrum
+
     newSpectrum = OrderedDict()
-    ratio = float(total) / limit
-    for timeStamp in spectrum:
-        points = spectrum[timeStamp].items()
-        reduced = OrderedDict()
-        for i in xrange(int(len(points) / ratio)):
-            point = points[int(i * ratio):int((i + 1) * ratio)][0]
-            reduced[point[0]] = point[1]
-        newSpectrum[timeStamp] = reduced
+    for i, timeStamp in enumerate(spectrum):
+        newSpectrum[timeStamp] = OrderedDict(zip(freqs[keep[i]].tolist(),
+                                                 levels[i, keep[i]].tolist()))
 
     return newSpectrum
 
 
-def split_spectrum(spectrum):
-    freqs = spectrum.keys()
-    powers = map(spectrum.get, freqs)
+def calc_columns(freqs, xLim, columns):
+    if xLim is None or xLim[1] <= xLim[0]:
+        xLim = (freqs[0], freqs[-1])
+    width = float(xLim[1] - xLim[0]) / columns
+    if width <= 0:
+        width = 1.
+    coarse = max(width, float(freqs[-1] - freqs[0]) / columns)
 
-    return freqs, powers
+    groups = numpy.empty(len(freqs), numpy.int64)
+    left = freqs < xLim[0]
+    right = freqs > xLim[1]
+    inside = ~(left | right)
+    offset = 0
+    for mask, start, step in ((left, freqs[0], coarse),
+                              (inside, xLim[0], width),
+                              (right, xLim[1], coarse)):
+        if mask.any():
+            groups[mask] = offset + numpy.floor((freqs[mask] - start) / step)
+            offset = groups[mask].max() + 1
+
+    return groups
 
 
 def split_spectrum_sort(spectrum):
@@ -238,44 +837,75 @@ def split_spectrum_sort(spectrum):
     return freqs, powers
 
 
-def slice_spectrum(spectrum, start, end):
-    if spectrum is None or start is None or end is None or len(spectrum) < 1:
-        return None
+def split_spectrum_array(sweep):
+    if isinstance(sweep, Sweep):
+        return sweep.get_arrays()
 
-    sweep = spectrum[max(spectrum)]
-    if len(sweep) == 0:
-        return None
+    freqs = numpy.array(sorted(sweep), numpy.float64)
+    levels = numpy.array([sweep[freq] for freq in freqs], numpy.float64)
+
+    return freqs, levels
 
-    if min(sweep) > start or max(sweep) < end:
-        length = len(spectrum)
-        if length > 1:
-            sweep = spectrum.values()[length - 2]
-        else:
-            return None
 
-    sweepTemp = {}
-    for f, p in sweep.iteritems():
-        if start <= f <= end:
-            sweepTemp[f] = p
-    return sorted(sweepTemp.items(), key=lambda t: t[0])
-
-
-def create_mesh(spectrum, mplTime):
-    total = len(spectrum)
-    width = len(spectrum[min(spectrum)])
-    x = numpy.empty((width, total + 1)) * numpy.nan
-    y = numpy.empty((width, total + 1)) * numpy.nan
-    z = numpy.empty((width, total + 1)) * numpy.nan
-
-    j = 1
-    for ys in spectrum:
-        time = utc_to_mpl(ys) if mplTime else ys
-        xs, zs = split_spectrum(spectrum[ys])
-        for i in range(len(xs)):
-            x[i, j] = xs[i]
-            y[i, j] = time
-            z[i, j] = zs[i]
-        j += 1
+def iter_sweeps(spectrum, descending=True):
+    for timeStamp in sorted(spectrum, reverse=descending):
+        freqs, levels = split_spectrum_array(spectrum[timeStamp])
+        yield timeStamp, freqs, levels
+
+
+def range_spectrum_array(sweep, start, end):
+    if isinstance(sweep, Sweep):
+        freqs, levels = sweep.get_range(start, end)
+        valid = ~numpy.isnan(levels)
+        return freqs[valid], levels[valid]
+
+    freqs, levels = split_spectrum_array(sweep)
+    lower = numpy.searchsorted(freqs, start, 'left')
+    upper = numpy.searchsorted(freqs, end, 'right')
+
+    return freqs[lower:upper], levels[lower:upper]
+
+
+def create_array(spectrum):
+    if isinstance(spectrum, SpectrumStore):
+        return spectrum.get_freqs(), spectrum.get_levels()
+
+    sweeps = [split_spectrum_array(spectrum[timeStamp])
+              for timeStamp in spectrum]
+    if len(sweeps):
+        freqs = numpy.unique(numpy.concatenate([xs for xs, _ys in sweeps]))
+    else:
+        freqs = numpy.empty(0)
+    levels = numpy.empty((len(sweeps), len(freqs)))
+    levels.fill(numpy.nan)
+    for i, (xs, ys) in enumerate(sweeps):
+        levels[i, numpy.searchsorted(freqs, xs)] = ys
+
+    return freqs, levels
+
+
+def create_array_sorted(spectrum, descending=False):
+    freqs, levels = create_array(spectrum)
+    times = numpy.array(spectrum.keys(), numpy.float64)
+    order = numpy.argsort(times)
+    if descending:
+        order = order[::-1]
+
+    return freqs, times[order], levels[order]
+
+
+def create_mesh_arrays(freqs, times, levels, mplTime):
+    if mplTime:
+        times = numpy.array([utc_to_mpl(timeStamp) for timeStamp in times])
+    width = len(freqs)
+    total = len(times)
+    x = numpy.empty((width, total + 1))
+    y = numpy.empty((width, total + 1))
+    z = numpy.empty((width, total + 1))
+
+    x[:, 1:] = freqs[:, numpy.newaxis]
+    y[:, 1:] = times[numpy.newaxis, :]
+    z[:, 1:] = levels.T
 
     x[:, 0] = x[:, 1]
     if mplTime:
@@ -288,6 +918,9 @@ def create_mesh(spectrum, mplTime):
 
 
 def sort_spectrum(spectrum):
+    if isinstance(spectrum, SpectrumStore):
+        return spectrum.copy(descending=True)
+
     newSpectrum = OrderedDict()
     for timeStamp in reversed(sorted(spectrum)):
         newPoints = OrderedDict()